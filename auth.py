@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from telegram import Update
+from telegram.ext import CallbackContext, ExtBot
+
+import storage
+
+@dataclass(frozen=True)
+class Auth:
+    user_id: Optional[int]
+    owner_id: str
+    is_owner: bool
+    is_admin: bool
+    is_premium: bool
+    is_private: bool
+    group_allowed: bool
+    group_mode: str
+
+    @property
+    def chat_allowed(self):
+        # Chat pribadi selalu boleh; grup hanya kalau mode grup aktif atau grup di-/addgrup.
+        return self.is_private or self.group_mode == "enable" or self.group_allowed
+
+def resolve(user_id, chat_id=None, chat_type="private"):
+    # Semua data diambil dari cache storage dalam satu kali jalan.
+    owner_id = storage.get_config("owner_id") or ""
+    is_owner = bool(owner_id) and str(user_id) == owner_id
+    is_private = chat_type == "private"
+    return Auth(
+        user_id=user_id,
+        owner_id=owner_id,
+        is_owner=is_owner,
+        is_admin=storage.is_admin(user_id),
+        is_premium=storage.is_premium(user_id),
+        is_private=is_private,
+        group_allowed=not is_private and storage.is_group_allowed(chat_id),
+        group_mode=storage.get_config("group_mode") or "disabled",
+    )
+
+class BotContext(CallbackContext[ExtBot, dict, dict, dict]):
+    __slots__ = ("auth",)
+
+    def __init__(self, application, chat_id=None, user_id=None):
+        super().__init__(application=application, chat_id=chat_id, user_id=user_id)
+        self.auth = None
+
+# Didaftarkan di group -1 supaya jalan sekali per Update sebelum handler lain.
+async def resolve_auth(update: Update, context: BotContext):
+    user = update.effective_user
+    chat = update.effective_chat
+    context.auth = resolve(
+        user.id if user else None,
+        chat.id if chat else None,
+        chat.type if chat else "private",
+    )
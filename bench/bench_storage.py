@@ -0,0 +1,210 @@
+"""Microbenchmark helper storage dan rate limiter.
+
+    python bench/bench_storage.py --out bench_output.json
+    python bench/bench_storage.py --usage-rows 100000 --compare bench_output.json
+
+Database diisi di direktori sementara, jadi config.db asli tidak tersentuh.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ContextTypes, TypeHandler
+from telegram.request import BaseRequest
+
+import bot
+import storage
+from auth import BotContext, resolve_auth
+from limiter import limiter
+
+OWNER_ID = 1
+
+def seed(args):
+    rng = random.Random(args.seed)
+    storage.init_db()
+    conn = storage.get_conn()
+    now = int(time.time())
+    conn.executemany("INSERT OR IGNORE INTO admins (user_id) VALUES (?)",
+                     ((1000 + i,) for i in range(args.admins)))
+    conn.executemany("INSERT OR IGNORE INTO premium (user_id) VALUES (?)",
+                     ((100000 + i,) for i in range(args.premium)))
+    conn.executemany("INSERT OR IGNORE INTO groups (chat_id) VALUES (?)",
+                     ((-1000 - i,) for i in range(args.groups)))
+    # Sebagian besar riwayat lama (30 hari), sedikit di jam terakhir.
+    conn.executemany(
+        "INSERT OR IGNORE INTO usage (user_id, ts) VALUES (?, ?)",
+        ((1000 + rng.randrange(args.admins), now - rng.randrange(30 * 86400)) for _ in range(args.usage_rows)),
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)",
+        [("owner_id", str(OWNER_ID)), ("email_from", "bench@example.com"), ("email_password", "x")],
+    )
+    conn.commit()
+    storage.load_cache()
+    limiter.load()
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    return {
+        "ops": repeat,
+        "mean_us": statistics.fmean(samples) / 1000,
+        "p50_us": samples[len(samples) // 2] / 1000,
+        "p95_us": samples[int(len(samples) * 0.95)] / 1000,
+        "min_us": samples[0] / 1000,
+    }
+
+def bench_storage(args):
+    rng = random.Random(args.seed)
+    admin = lambda: 1000 + rng.randrange(args.admins)
+    chat = lambda: -rng.randrange(1, 5000)
+    cases = {
+        "get_config": lambda: storage.get_config("group_mode"),
+        "is_admin": lambda: storage.is_admin(admin()),
+        "is_premium": lambda: storage.is_premium(admin()),
+        "is_group_allowed": lambda: storage.is_group_allowed(chat()),
+        "record_usage": lambda: storage.record_usage(admin()),
+        "get_usage_count": lambda: storage.get_usage_count(admin()),
+        "get_next_reset_time": lambda: storage.get_next_reset_time(admin()),
+        "save_chat": lambda: storage.save_chat(chat(), "group", "bench"),
+        "flush_chats": storage.flush_chats,
+        "get_stats": storage.get_stats,
+        "limiter_reserve_release": lambda: _reserve_release(admin()),
+    }
+    return {name: measure(func, args.repeat) for name, func in cases.items()}
+
+def _reserve_release(user_id):
+    slot = limiter.reserve(user_id)
+    if slot:
+        limiter.release(slot)
+
+# === /banding end-to-end (tanpa jaringan & SMTP) ===
+class StubRequest(BaseRequest):
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        params = request_data.parameters if request_data else {}
+        if url.endswith("/getMe"):
+            result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench"}
+        else:
+            result = {"message_id": 1, "date": 0, "chat": {"id": params.get("chat_id", 0), "type": "private"}}
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+async def _bench_banding(args):
+    rng = random.Random(args.seed)
+    bot.kirim_email_nomor_saja = lambda *a: (True, None)
+    app = (
+        Application.builder()
+        .token("1:bench")
+        .request(StubRequest())
+        .context_types(ContextTypes(context=BotContext))
+        .build()
+    )
+    app.add_handler(TypeHandler(Update, resolve_auth), group=-1)
+    app.add_handler(CommandHandler("banding", bot.banding))
+    await app.initialize()
+
+    samples = []
+    for i in range(args.repeat):
+        # Campuran user premium (tanpa limit) dan admin biasa.
+        user_id = 100000 + rng.randrange(args.premium) if i % 2 else 1000 + rng.randrange(args.admins)
+        update = Update.de_json({
+            "update_id": i,
+            "message": {
+                "message_id": i, "date": 0, "text": "/banding 081234567890",
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+                "entities": [{"type": "bot_command", "offset": 0, "length": 8}],
+            },
+        }, app.bot)
+        start = time.perf_counter_ns()
+        await app.process_update(update)
+        samples.append(time.perf_counter_ns() - start)
+    await app.shutdown()
+
+    samples.sort()
+    return {
+        "ops": len(samples),
+        "mean_us": statistics.fmean(samples) / 1000,
+        "p50_us": samples[len(samples) // 2] / 1000,
+        "p95_us": samples[int(len(samples) * 0.95)] / 1000,
+        "min_us": samples[0] / 1000,
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    print(f"\n{'case':<28}{'baseline p50':>14}{'now p50':>12}{'change':>10}")
+    for name, now in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = (now["p50_us"] - old["p50_us"]) / old["p50_us"] * 100 if old["p50_us"] else 0
+        print(f"{name:<28}{old['p50_us']:>12.1f}us{now['p50_us']:>10.1f}us{change:>+9.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--admins", type=int, default=5000)
+    parser.add_argument("--premium", type=int, default=5000)
+    parser.add_argument("--groups", type=int, default=1000)
+    parser.add_argument("--usage-rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="simpan hasil sebagai JSON")
+    parser.add_argument("--compare", help="bandingkan dengan hasil JSON sebelumnya")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_FILE = os.path.join(tmp, "config.db")
+        started = time.perf_counter()
+        seed(args)
+        print(f"seed: {time.perf_counter() - started:.1f}s")
+
+        results = bench_storage(args)
+        results["banding_handler"] = asyncio.run(_bench_banding(args))
+        storage.close_db()
+
+    for name, r in results.items():
+        print(f"{name:<28} p50 {r['p50_us']:>9.1f}us  p95 {r['p95_us']:>9.1f}us  mean {r['mean_us']:>9.1f}us")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
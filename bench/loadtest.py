@@ -0,0 +1,280 @@
+"""Load test end-to-end dengan Bot API palsu di localhost.
+
+    python bench/loadtest.py --users 500 --groups 50 --requests 20
+    python bench/loadtest.py --mode webhook
+
+Bot dijalankan utuh (polling, dispatch, handler, balasan) lewat
+build_application(), tapi base_url diarahkan ke server HTTP lokal di skrip ini
+dan SMTP diganti sink di memori. Setiap klien virtual adalah satu chat yang
+mengirim update berikutnya setelah balasan sebelumnya datang. Dengan
+--mode webhook update di-POST ke server webhook bot, bukan lewat getUpdates.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qs
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("METRICS_PORT", "0")
+
+import bot
+import outbound
+import storage
+from limiter import limiter
+
+TOKEN = "123:loadtest"
+OWNER_ID = 1
+WEBHOOK_SECRET = "loadtest-secret"
+
+# === FAKE BOT API ===
+class FakeBotApi:
+    def __init__(self):
+        self._updates = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Condition()
+        self._waiters = {}
+        self._callback_chats = {}
+        self.calls = {}
+        self.webhook_url = None
+        self._http = None
+
+    # --- sisi klien virtual ---
+    async def push(self, update, chat_id):
+        update["update_id"] = next(self._update_ids)
+        if "callback_query" in update:
+            self._callback_chats[update["callback_query"]["id"]] = chat_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id] = future
+        if self.webhook_url:
+            self._http = self._http or httpx.AsyncClient(limits=httpx.Limits(max_connections=64))
+            response = await self._http.post(
+                self.webhook_url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+            )
+            response.raise_for_status()
+            return future
+        async with self._new_update:
+            self._updates.append(update)
+            self._new_update.notify_all()
+        return future
+
+    async def aclose(self):
+        if self._http:
+            await self._http.aclose()
+
+    def _reply_seen(self, params):
+        chat_id = params.get("chat_id")
+        if chat_id is None and "callback_query_id" in params:
+            chat_id = self._callback_chats.pop(params["callback_query_id"], None)
+        if chat_id is None:
+            return
+        future = self._waiters.pop(int(chat_id), None)
+        if future and not future.done():
+            future.set_result(time.perf_counter())
+
+    # --- sisi bot ---
+    async def _get_updates(self, params):
+        offset = int(params.get("offset", 0) or 0)
+        limit = int(params.get("limit", 100) or 100)
+        timeout = float(params.get("timeout", 0) or 0)
+        async with self._new_update:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            if not self._updates and timeout:
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return self._updates[:limit]
+
+    async def handle(self, method, params):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method == "getMe":
+            return {"id": 123, "is_bot": True, "first_name": "load", "username": "loadtest_bot"}
+        self._reply_seen(params)
+        if method in ("sendMessage", "editMessageText", "sendDocument"):
+            chat_id = int(params.get("chat_id", 0))
+            return {
+                "message_id": next(self._message_ids), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+    async def serve(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                method = request_line.split(b" ")[1].decode().rsplit("/", 1)[-1]
+                params = {}
+                if headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+                    params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+                result = await self.handle(method, params)
+
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(payload)).encode() + b"\r\n\r\n" + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+# === KLIEN VIRTUAL ===
+def _message(chat_id, chat_type, user_id, text):
+    return {"message": {
+        "message_id": random.randrange(1, 2**31), "date": int(time.time()), "text": text,
+        "chat": {"id": chat_id, "type": chat_type, "title": "load" if chat_type != "private" else None},
+        "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+    }}
+
+def _callback(chat_id, chat_type, user_id, data):
+    return {"callback_query": {
+        "id": str(random.randrange(2**62)), "chat_instance": "load", "data": data,
+        "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+        "message": {"message_id": 1, "date": int(time.time()), "chat": {"id": chat_id, "type": chat_type}},
+    }}
+
+async def client(api, chat_id, chat_type, user_id, args, results, rng):
+    for _ in range(args.requests):
+        roll = rng.random()
+        if roll < args.start_ratio:
+            kind, update = "start", _message(chat_id, chat_type, user_id, "/start")
+        elif roll < args.start_ratio + args.banding_ratio:
+            number = f"0812{rng.randrange(10**7):07d}"
+            kind, update = "banding", _message(chat_id, chat_type, user_id, f"/banding {number}")
+        else:
+            kind, update = "callback", _callback(chat_id, chat_type, user_id, "menu_admin")
+        sent = time.perf_counter()
+        future = await api.push(update, chat_id)
+        try:
+            done = await asyncio.wait_for(future, args.timeout)
+            results.setdefault(kind, []).append(done - sent)
+        except asyncio.TimeoutError:
+            results.setdefault("timeout", []).append(args.timeout)
+
+def percentile(samples, q):
+    return samples[min(int(len(samples) * q), len(samples) - 1)] * 1000
+
+async def run(args):
+    emails = []
+    bot.kirim_email_nomor_saja = lambda nomor, *a: emails.append(nomor) or (True, None)
+
+    if not args.telegram_limits:
+        # Bot API palsu tidak punya flood limit; yang diukur bot-nya, bukan antrean keluar.
+        outbound.GLOBAL_RATE = outbound.PRIVATE_RATE = outbound.GROUP_RATE = 1e6
+        outbound.PRIVATE_BURST = outbound.GROUP_BURST = 1e6
+
+    rng = random.Random(args.seed)
+    users = list(range(1000, 1000 + args.users))
+    storage.init_db()
+    storage.set_config("owner_id", str(OWNER_ID))
+    storage.set_config("email_from", "load@example.com")
+    storage.set_config("email_password", "x")
+    storage.set_config("group_mode", "enable")
+    for user_id in users[: int(len(users) * args.admin_ratio)]:
+        storage.add_admin(user_id)
+    for user_id in users[: int(len(users) * args.admin_ratio * args.premium_ratio)]:
+        storage.add_premium(user_id)
+    storage.load_cache()
+    limiter.load()
+
+    api = FakeBotApi()
+    server = await asyncio.start_server(api.serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    app = bot.build_application(TOKEN, base_url=f"http://127.0.0.1:{port}/bot", concurrency=args.concurrency)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    if args.mode == "webhook":
+        webhook_port = args.webhook_port
+        api.webhook_url = f"http://127.0.0.1:{webhook_port}/telegram"
+        await app.updater.start_webhook(
+            listen="127.0.0.1", port=webhook_port, url_path="telegram",
+            secret_token=WEBHOOK_SECRET, webhook_url=api.webhook_url,
+        )
+    else:
+        await app.updater.start_polling(poll_interval=0, timeout=5)
+    await app.start()
+
+    clients = [(user_id, "private", user_id) for user_id in users]
+    clients += [(-100 - g, "group", rng.choice(users)) for g in range(args.groups)]
+    results = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(api, chat_id, chat_type, user_id, args, results, random.Random(rng.random()))
+        for chat_id, chat_type, user_id in clients
+    ))
+    elapsed = time.perf_counter() - started
+
+    await app.updater.stop()
+    await app.stop()
+    if app.post_stop:
+        await app.post_stop(app)
+    await app.shutdown()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
+    server.close()
+    await api.aclose()
+
+    total = sum(len(v) for k, v in results.items() if k != "timeout")
+    print(f"clients: {len(clients)}, updates: {total}, waktu: {elapsed:.2f}s, {total / elapsed:.1f} updates/s")
+    print(f"timeout: {len(results.get('timeout', []))}, email ke sink: {len(emails)}")
+    print(f"{'kind':<10}{'n':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    every = sorted(itertools.chain(*(v for k, v in results.items() if k != "timeout")))
+    for kind, samples in sorted(results.items()) + [("all", every)]:
+        if kind == "timeout" or not samples:
+            continue
+        samples = sorted(samples)
+        print(f"{kind:<10}{len(samples):>8}{percentile(samples, .5):>8.1f}ms"
+              f"{percentile(samples, .95):>8.1f}ms{percentile(samples, .99):>8.1f}ms")
+    print("Bot API calls:", json.dumps(api.calls, sort_keys=True))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="update per klien")
+    parser.add_argument("--admin-ratio", type=float, default=0.5)
+    parser.add_argument("--premium-ratio", type=float, default=0.3, help="bagian dari admin")
+    parser.add_argument("--start-ratio", type=float, default=0.3)
+    parser.add_argument("--banding-ratio", type=float, default=0.4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--webhook-port", type=int, default=18443)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--telegram-limits", action="store_true", help="pakai batas kirim Telegram asli di outbound.py")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_FILE = os.path.join(tmp, "config.db")
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -1,171 +1,37 @@
-import sqlite3
 import smtplib
 import re
 import time
+import os
+import socket
+import sys
+import tempfile
 import asyncio
+import functools
 from email.mime.text import MIMEText
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters
-
-DB_FILE = "config.db"
-
-# === DATABASE ===
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS config (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    """)
-    c.execute("INSERT OR IGNORE INTO config (key, value) VALUES ('group_mode', 'disabled')")
-    c.execute("INSERT OR IGNORE INTO config (key, value) VALUES ('owner_id', '')")
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS admins (
-            user_id INTEGER PRIMARY KEY
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS premium (
-            user_id INTEGER PRIMARY KEY
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS usage (
-            user_id INTEGER,
-            timestamp REAL,
-            PRIMARY KEY (user_id, timestamp)
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS groups (
-            chat_id INTEGER PRIMARY KEY
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS active_chats (
-            chat_id INTEGER PRIMARY KEY,
-            chat_type TEXT,
-            title TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def get_config(key):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT value FROM config WHERE key = ?", (key,))
-    row = c.fetchone()
-    conn.close()
-    return row[0] if row else None
-
-def set_config(key, value):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, value))
-    conn.commit()
-    conn.close()
-
-def is_admin(user_id):
-    owner_id = get_config("owner_id")
-    if not owner_id:
-        return False
-    if str(user_id) == owner_id:
-        return True
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM admins WHERE user_id = ?", (user_id,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
-
-def is_premium(user_id):
-    owner_id = get_config("owner_id")
-    if str(user_id) == owner_id:
-        return True
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM premium WHERE user_id = ?", (user_id,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
-
-def add_premium(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO premium (user_id) VALUES (?)", (user_id,))
-    conn.commit()
-    conn.close()
-
-def add_admin(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO admins (user_id) VALUES (?)", (user_id,))
-    conn.commit()
-    conn.close()
-
-def record_usage(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    now = time.time()
-    c.execute("INSERT INTO usage (user_id, timestamp) VALUES (?, ?)", (user_id, now))
-    conn.commit()
-    conn.close()
-
-def get_usage_count(user_id, window_hours=1):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    cutoff = time.time() - (window_hours * 3600)
-    c.execute("SELECT COUNT(*) FROM usage WHERE user_id = ? AND timestamp > ?", (user_id, cutoff))
-    count = c.fetchone()[0]
-    conn.close()
-    return count
-
-def get_next_reset_time(user_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("""
-        SELECT timestamp FROM usage 
-        WHERE user_id = ? 
-        ORDER BY timestamp DESC 
-        LIMIT 5
-    """, (user_id,))
-    rows = c.fetchall()
-    conn.close()
-    
-    if len(rows) < 5:
-        return None
-    
-    fifth_time = rows[-1][0]
-    next_reset = fifth_time + 3600
-    return next_reset if next_reset > time.time() else None
-
-def add_group(chat_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO groups (chat_id) VALUES (?)", (chat_id,))
-    conn.commit()
-    conn.close()
-
-def is_group_allowed(chat_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM groups WHERE chat_id = ?", (chat_id,))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
-
-def save_chat(chat_id, chat_type, title=""):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO active_chats (chat_id, chat_type, title) VALUES (?, ?, ?)",
-              (chat_id, chat_type, title))
-    conn.commit()
-    conn.close()
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, TypeHandler, filters
+
+import settings
+import storage
+from auth import BotContext, resolve_auth
+from broadcast import broadcasts
+from concurrency import KeyedUpdateProcessor
+from countdown import countdowns, format_wait
+from exporter import EXPORT_FORMATS, MAX_EXPORT_SIZE, export_filename, export_to, parse_time
+from importer import MAX_IMPORT_SIZE, import_file
+from limiter import limiter
+from outbound import OutboundScheduler
+from persistence import SQLitePersistence
+from profiler import PROFILE_SECONDS, profiler
+from metrics import TimedRequest, instrument_application, start_server, stop_server, summary, timed
+from storage import (
+    init_db, get_config, set_config, add_premium, add_admin, list_admins, list_premium,
+    record_usage, add_group, save_chat, get_stats, EXPORT_QUERIES,
+    run_db, close_db, load_cache, flush_chats, CHAT_FLUSH_INTERVAL, prune_usage, PRUNE_BATCH,
+)
 
 # === EMAIL ===
+@timed("smtp")
 def kirim_email_nomor_saja(nomor_final: str, email_from: str, email_password: str):
     body = f"+{nomor_final}"
     msg = MIMEText(body)
@@ -182,54 +48,109 @@ def kirim_email_nomor_saja(nomor_final: str, email_from: str, email_password: st
     except Exception as e:
         return False, str(e)
 
-# === COMMANDS ===
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    owner_id = get_config("owner_id")
-    if not owner_id:
-        await update.message.reply_text("🔐 Bot belum dikonfigurasi.\nKirim: /setowner [ID_ANDA]")
-        return
-
-    user_id = update.effective_user.id
-    is_owner = (str(user_id) == owner_id)
-    is_adm = is_admin(user_id)
-
-    chat = update.effective_chat
-    save_chat(chat.id, chat.type, getattr(chat, 'title', ''))
-
-    if is_adm and not is_owner:
-        await update.message.reply_text("👥 ADMIN COMMAND")
-        return
-
-    if is_owner:
-        keyboard = [
-            [InlineKeyboardButton("👑 OWNER", callback_data="menu_owner")],
-            [InlineKeyboardButton("👥 ADMIN", callback_data="menu_admin")],
-            [InlineKeyboardButton("👨‍💻 Developer", url=f"tg://user?id={owner_id}")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text("🔐 Selamat datang, Owner!", reply_markup=reply_markup)
+# === MENU ===
+# Keyboard dibangun sekali saat import; baris berisi (teks, callback_data).
+OWNER_MENU = [
+    [("📧 Set Email", "owner_setemail")],
+    [("🔑 Set Password", "owner_setpass")],
+    [("➕ Add Admin", "owner_addadmin")],
+    [("🌟 Add Premium", "owner_addpremium")],
+    [("📊 Stats", "owner_stats")],
+    [("📈 Metrics", "owner_metrics")],
+    [("🧪 Profile", "owner_profile"), ("🧪 Profile + Memori", "owner_profile_mem")],
+    [("📢 Broadcast", "owner_broadcast")],
+    [("📥 Import File", "owner_import")],
+    [("⬅️ Kembali", "back_to_start")],
+]
+IMPORT_MENU = [
+    [("👥 Admin", "import_admins"), ("🌟 Premium", "import_premium"), ("💬 Grup", "import_groups")],
+    [("⬅️ Kembali", "menu_owner")],
+]
+ADMIN_MENU = [
+    [("🔄 Set Mode Grup", "admin_setmode")],
+    [("➕ Add Grup Ini", "admin_addgrup")],
+    [("⬅️ Kembali", "back_to_start")],
+]
+SETMODE_MENU = [
+    [("✅ Enable", "setmode_enable")],
+    [("❌ Disable", "setmode_disable")],
+]
+
+def build_markup(rows):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(text, callback_data=data) for text, data in row] for row in rows
+    ])
+
+OWNER_MENU_MARKUP = build_markup(OWNER_MENU)
+ADMIN_MENU_MARKUP = build_markup(ADMIN_MENU)
+SETMODE_MARKUP = build_markup(SETMODE_MENU)
+IMPORT_MARKUP = build_markup(IMPORT_MENU)
+
+# Tombol Developer butuh owner_id, jadi markup /start di-cache per owner dan peran.
+@functools.lru_cache(maxsize=8)
+def start_markup(owner_id, is_owner):
+    developer = [InlineKeyboardButton("👨‍💻 Developer", url=f"tg://user?id={owner_id}")]
+    if not is_owner:
+        return InlineKeyboardMarkup([developer])
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("👑 OWNER", callback_data="menu_owner")],
+        [InlineKeyboardButton("👥 ADMIN", callback_data="menu_admin")],
+        developer,
+    ])
+
+# callback_data -> handler. Semua tombol lewat satu CallbackQueryHandler
+# (route_callback) yang cukup lookup dict, bukan cek regex satu per satu.
+CALLBACK_ROUTES = {}
+
+def callback(*names):
+    def decorator(func):
+        for name in names:
+            CALLBACK_ROUTES[name] = timed("callback", name)(func)
+        return func
+    return decorator
+
+async def route_callback(update: Update, context: BotContext):
+    handler = CALLBACK_ROUTES.get(update.callback_query.data)
+    if handler is None:
+        # Tombol dari versi lama / data tak dikenal: cukup hentikan loading-nya
+        await update.callback_query.answer()
         return
+    await handler(update, context)
 
-    pesan_bantuan = (
-        "👋 Halo! Ini adalah bot banding WhatsApp.\n\n"
-        "✅ **Cara Pakai**:\n"
-        "Kirim perintah:\n"
-        "   <code>/banding [nomor]</code>\n\n"
-        "📝 **Format Nomor**:\n"
-        "• Gunakan kode negara (tanpa +)\n"
-        "• Contoh Indonesia: <code>6281234567890</code>\n"
-        "• Contoh AS: <code>14155552671</code>\n\n"
-        "ℹ️ Bot akan kirim nomor ke WhatsApp dalam format: <code>+6281234567890</code>"
-    )
-
-    keyboard = [[InlineKeyboardButton("👨‍💻 Developer", url=f"tg://user?id={owner_id}")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await update.message.reply_text(pesan_bantuan, reply_markup=reply_markup, parse_mode="HTML")
+# === COMMANDS ===
+PESAN_BANTUAN = (
+    "👋 Halo! Ini adalah bot banding WhatsApp.\n\n"
+    "✅ **Cara Pakai**:\n"
+    "Kirim perintah:\n"
+    "   <code>/banding [nomor]</code>\n\n"
+    "📝 **Format Nomor**:\n"
+    "• Gunakan kode negara (tanpa +)\n"
+    "• Contoh Indonesia: <code>6281234567890</code>\n"
+    "• Contoh AS: <code>14155552671</code>\n\n"
+    "ℹ️ Bot akan kirim nomor ke WhatsApp dalam format: <code>+6281234567890</code>"
+)
+
+def start_view(auth):
+    # (teks, markup, parse_mode) untuk /start dan tombol Kembali
+    if not auth.owner_id:
+        return "🔐 Bot belum dikonfigurasi.\nKirim: /setowner [ID_ANDA]", None, None
+    if auth.is_admin and not auth.is_owner:
+        return "👥 ADMIN COMMAND", None, None
+    if auth.is_owner:
+        return "🔐 Selamat datang, Owner!", start_markup(auth.owner_id, True), None
+    return PESAN_BANTUAN, start_markup(auth.owner_id, False), "HTML"
+
+async def start(update: Update, context: BotContext):
+    if context.auth.owner_id:
+        chat = update.effective_chat
+        save_chat(chat.id, chat.type, getattr(chat, 'title', ''))
+
+    text, reply_markup, parse_mode = start_view(context.auth)
+    await update.message.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
 
 # === PERINTAH KRITIS: /setowner (BISA DIAKSES TANPA OWNER) ===
-async def setowner(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    current_owner = get_config("owner_id")
+async def setowner(update: Update, context: BotContext):
+    current_owner = context.auth.owner_id
     if current_owner:
         await update.message.reply_text(f"❌ Owner sudah di-set: {current_owner}")
         return
@@ -244,148 +165,228 @@ async def setowner(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ ID harus angka!")
         return
 
-    set_config("owner_id", owner_id)
+    await run_db(set_config, "owner_id", owner_id)
     await update.message.reply_text(f"✅ Owner ID disetel ke: {owner_id}\n\nKirim /start untuk akses menu.")
 
-async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not is_admin(update.effective_user.id):
+async def help_cmd(update: Update, context: BotContext):
+    if not context.auth.is_admin:
         await update.message.reply_text("❌ Hanya admin yang bisa lihat bantuan.")
         return
     await update.message.reply_text("Gunakan /start untuk akses menu.")
 
+async def export_cmd(update: Update, context: BotContext):
+    if not context.auth.is_owner:
+        await update.message.reply_text("❌ Hanya owner yang bisa export data.")
+        return
+
+    args = list(context.args)
+    fmt = next((arg for arg in args if arg in EXPORT_FORMATS), "csv")
+    args = [arg for arg in args if arg not in EXPORT_FORMATS]
+    if not args or args[0] not in EXPORT_QUERIES or len(args) > 3:
+        await update.message.reply_text(
+            "❌ Gunakan: /export usage|hourly|daily|chats [dari] [sampai] [csv|ndjson]\n"
+            "• usage: per user, hanya ~2 jam terakhir\n"
+            "• hourly: total per jam, 35 hari terakhir\n"
+            "• daily: total per hari, semua riwayat\n"
+            "Contoh: /export daily 2024-05-01 2024-05-31"
+        )
+        return
+    name = args[0]
+    try:
+        since = parse_time(args[1]) if len(args) > 1 else None
+        until = parse_time(args[2], end=True) if len(args) > 2 else None
+    except ValueError:
+        await update.message.reply_text("❌ Waktu harus YYYY-MM-DD atau unix timestamp!")
+        return
+
+    if name == "chats":
+        # Chat yang masih di buffer write-behind ikut masuk export
+        await run_db(flush_chats)
+    with tempfile.TemporaryFile() as tmp:
+        count = await export_to(tmp, name, fmt, since, until)
+        # InputFile membaca seluruh file ke memori sebelum upload, dan Bot API
+        # menolak upload di atas 50 MB; persempit rentang waktunya.
+        if tmp.tell() > MAX_EXPORT_SIZE:
+            await update.message.reply_text(
+                f"❌ Hasil export {tmp.tell() // 2**20} MB, melebihi batas {MAX_EXPORT_SIZE // 2**20} MB. "
+                "Persempit rentang waktu."
+            )
+            return
+        tmp.seek(0)
+        await update.message.reply_document(
+            document=tmp,
+            filename=export_filename(name, fmt),
+            caption=f"📤 Export {name}: {count} baris",
+        )
+
 # --- Menu Callbacks ---
-async def menu_owner(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("menu_owner")
+async def menu_owner(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
-    if str(query.from_user.id) != get_config("owner_id"):
+    if not context.auth.is_owner:
         await query.edit_message_text("❌ Akses ditolak.")
         return
 
-    keyboard = [
-        [InlineKeyboardButton("📧 Set Email", callback_data="owner_setemail")],
-        [InlineKeyboardButton("🔑 Set Password", callback_data="owner_setpass")],
-        [InlineKeyboardButton("➕ Add Admin", callback_data="owner_addadmin")],
-        [InlineKeyboardButton("🌟 Add Premium", callback_data="owner_addpremium")],
-        [InlineKeyboardButton("📊 Stats", callback_data="owner_stats")],
-        [InlineKeyboardButton("📢 Broadcast", callback_data="owner_broadcast")],
-        [InlineKeyboardButton("⬅️ Kembali", callback_data="back_to_start")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text("👑 **Panel Owner**", reply_markup=reply_markup, parse_mode="Markdown")
-
-async def menu_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await query.edit_message_text("👑 **Panel Owner**", reply_markup=OWNER_MENU_MARKUP, parse_mode="Markdown")
+
+@callback("menu_admin")
+async def menu_admin(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
-    if not is_admin(query.from_user.id):
+    if not context.auth.is_admin:
         await query.edit_message_text("❌ Akses ditolak.")
         return
 
-    keyboard = [
-        [InlineKeyboardButton("🔄 Set Mode Grup", callback_data="admin_setmode")],
-        [InlineKeyboardButton("➕ Add Grup Ini", callback_data="admin_addgrup")],
-        [InlineKeyboardButton("⬅️ Kembali", callback_data="back_to_start")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text("👥 **Panel Admin**", reply_markup=reply_markup, parse_mode="Markdown")
+    await query.edit_message_text("👥 **Panel Admin**", reply_markup=ADMIN_MENU_MARKUP, parse_mode="Markdown")
 
-async def back_to_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("back_to_start")
+async def back_to_start(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
-    await start(query, context)
+    text, reply_markup, parse_mode = start_view(context.auth)
+    await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
 
 # --- Owner Actions (via button) ---
-async def owner_setemail(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("owner_setemail")
+async def owner_setemail(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
     context.user_data["action"] = "setemail"
     await query.edit_message_text("📧 Kirim email pengirim (misal: cs@gmail.com):")
 
-async def owner_setpass(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("owner_setpass")
+async def owner_setpass(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
     context.user_data["action"] = "setpass"
     await query.edit_message_text("🔑 Kirim App Password email:")
 
-async def owner_addadmin(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("owner_addadmin")
+async def owner_addadmin(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
     context.user_data["action"] = "addadmin"
     await query.edit_message_text("➕ Kirim ID Telegram admin:")
 
-async def owner_addpremium(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("owner_addpremium")
+async def owner_addpremium(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
     context.user_data["action"] = "addpremium"
     await query.edit_message_text("🌟 Kirim ID Telegram user premium:")
 
-async def owner_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+def _trend(current, previous):
+    if current > previous:
+        return "📈"
+    if current < previous:
+        return "📉"
+    return "➖"
+
+@callback("owner_stats")
+async def owner_stats(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT COUNT(*) FROM usage")
-    total_banding = c.fetchone()[0]
-    c.execute("SELECT COUNT(*) FROM premium")
-    total_premium = c.fetchone()[0]
-    c.execute("SELECT COUNT(*) FROM admins")
-    total_admin = c.fetchone()[0]
-    c.execute("SELECT COUNT(*) FROM groups")
-    total_grup = c.fetchone()[0]
-    conn.close()
+    stats = await run_db(get_stats)
     pesan = (
         "📊 **Statistik Bot**\n\n"
-        f"• Total Banding: `{total_banding}`\n"
-        f"• User Premium: `{total_premium}`\n"
-        f"• Admin: `{total_admin}`\n"
-        f"• Grup Aktif: `{total_grup}`\n"
+        f"• Total Banding: `{stats['usage']}`\n"
+        f"• Banding 24 jam: `{stats['usage_24h']}` {_trend(stats['usage_24h'], stats['usage_prev_24h'])}\n"
+        f"• Banding 7 hari: `{stats['usage_7d']}` {_trend(stats['usage_7d'], stats['usage_prev_7d'])}\n"
+        f"• User Premium: `{stats['premium']}`\n"
+        f"• Admin: `{stats['admins']}`\n"
+        f"• Grup Aktif: `{stats['groups']}`\n"
     )
     await query.edit_message_text(pesan, parse_mode="Markdown")
 
-async def owner_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("owner_metrics")
+async def owner_metrics(update: Update, context: BotContext):
+    query = update.callback_query
+    await query.answer()
+    if not context.auth.is_owner:
+        await query.edit_message_text("❌ Akses ditolak.")
+        return
+    await query.edit_message_text(summary(), parse_mode="Markdown")
+
+@callback("owner_profile", "owner_profile_mem")
+async def owner_profile(update: Update, context: BotContext):
+    query = update.callback_query
+    await query.answer()
+    if not context.auth.is_owner:
+        await query.edit_message_text("❌ Akses ditolak.")
+        return
+    memory = query.data == "owner_profile_mem"
+    if not profiler.start(context.job_queue, query.message.chat_id, PROFILE_SECONDS, memory=memory):
+        await query.edit_message_text("⚠️ Profiling sedang berjalan.")
+        return
+    await query.edit_message_text(f"🧪 Profiling {PROFILE_SECONDS} detik dimulai, hasil dikirim sebagai file.")
+
+@callback("owner_broadcast")
+async def owner_broadcast(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
     context.user_data["action"] = "broadcast"
     await query.edit_message_text("📢 Kirim pesan broadcast:")
 
+@callback("owner_import")
+async def owner_import(update: Update, context: BotContext):
+    query = update.callback_query
+    await query.answer()
+    if not context.auth.is_owner:
+        await query.edit_message_text("❌ Akses ditolak.")
+        return
+    await query.edit_message_text("📥 **Import dari file**\nPilih tujuan:", reply_markup=IMPORT_MARKUP, parse_mode="Markdown")
+
+@callback("import_admins", "import_premium", "import_groups")
+async def owner_import_target(update: Update, context: BotContext):
+    query = update.callback_query
+    await query.answer()
+    if not context.auth.is_owner:
+        await query.edit_message_text("❌ Akses ditolak.")
+        return
+    context.user_data["action"] = query.data
+    await query.edit_message_text(
+        "📄 Kirim file CSV/TXT sebagai dokumen.\n"
+        "Satu ID per baris (kolom pertama dipakai, header dilewati)."
+    )
+
 # --- Admin Actions (via button) ---
-async def admin_setmode(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("admin_setmode")
+async def admin_setmode(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
-    current = get_config("group_mode") or "disabled"
+    current = context.auth.group_mode
     status = "✅ Aktif" if current == "enable" else "❌ Nonaktif"
-    keyboard = [
-        [InlineKeyboardButton("✅ Enable", callback_data="setmode_enable")],
-        [InlineKeyboardButton("❌ Disable", callback_data="setmode_disable")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
     await query.edit_message_text(
         f"🔄 Pengaturan Mode Grup\nStatus saat ini: {status}\n\nPilih mode:",
-        reply_markup=reply_markup
+        reply_markup=SETMODE_MARKUP
     )
 
-async def admin_addgrup(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("admin_addgrup")
+async def admin_addgrup(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
     chat = query.message.chat
     if chat.type == "private":
         await query.edit_message_text("❌ Hanya bisa di grup!")
         return
-    add_group(chat.id)
+    await run_db(add_group, chat.id)
     await query.edit_message_text("✅ Grup ini diizinkan!")
 
 # --- Setmode Button Handler ---
-async def set_mode_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callback("setmode_enable", "setmode_disable")
+async def set_mode_button(update: Update, context: BotContext):
     query = update.callback_query
     await query.answer()
-    if not is_admin(query.from_user.id):
+    if not context.auth.is_admin:
         await query.edit_message_text("❌ Akses ditolak.")
         return
     data = query.data
     if data == "setmode_enable":
-        set_config("group_mode", "enable")
+        await run_db(set_config, "group_mode", "enable")
         await query.edit_message_text("✅ Mode grup diaktifkan!\nBot bisa dipakai di semua grup.")
     elif data == "setmode_disable":
-        set_config("group_mode", "disable")
+        await run_db(set_config, "group_mode", "disable")
         await query.edit_message_text(
             "❌ Mode grup dinonaktifkan!\n"
             "Bot hanya aktif di:\n"
@@ -394,8 +395,8 @@ async def set_mode_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 # --- Text Handler for Owner Actions ---
-async def handle_owner_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if str(update.effective_user.id) != get_config("owner_id"):
+async def handle_owner_input(update: Update, context: BotContext):
+    if not context.auth.is_owner:
         return
 
     action = context.user_data.get("action")
@@ -405,63 +406,84 @@ async def handle_owner_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
         if "@" not in text:
             await update.message.reply_text("❌ Format email tidak valid!")
             return
-        set_config("email_from", text)
+        await run_db(set_config, "email_from", text)
         await update.message.reply_text(f"✅ Email disetel ke: {text}")
     elif action == "setpass":
-        set_config("email_password", text)
+        await run_db(set_config, "email_password", text)
         await update.message.reply_text("✅ App Password disetel!")
     elif action == "addadmin":
         try:
             aid = int(text)
-            add_admin(aid)
+            await run_db(add_admin, aid)
             await update.message.reply_text(f"✅ Admin ditambahkan: {aid}")
         except:
             await update.message.reply_text("❌ ID harus angka!")
     elif action == "addpremium":
         try:
             pid = int(text)
-            add_premium(pid)
+            await run_db(add_premium, pid)
             await update.message.reply_text(f"🌟 Premium ditambahkan: {pid}")
         except:
             await update.message.reply_text("❌ ID harus angka!")
     elif action == "broadcast":
         pesan = "📣 **PENGUMUMAN**\n\n" + text
-        owner_id = get_config("owner_id")
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT user_id FROM admins")
-        admins = [row[0] for row in c.fetchall()]
-        c.execute("SELECT user_id FROM premium")
-        premiums = [row[0] for row in c.fetchall()]
-        conn.close()
+        owner_id = context.auth.owner_id
+        admins = list_admins()
+        premiums = list_premium()
         penerima = list(set(admins + premiums + [int(owner_id)]))
-        sukses = 0
-        for uid in penerima:
-            try:
-                await context.bot.send_message(chat_id=uid, text=pesan, parse_mode="Markdown")
-                sukses += 1
-            except:
-                pass
-        await update.message.reply_text(f"✅ Broadcast selesai! Terkirim ke {sukses} user.")
+        # Dikirim di background; progres dilaporkan lewat pesan terpisah.
+        job_id = await broadcasts.start(context.application, update.effective_chat.id, pesan, penerima)
+        await update.message.reply_text(f"📢 Broadcast #{job_id} dimulai ke {len(penerima)} user.")
     
     context.user_data.pop("action", None)
 
+# --- Document Handler for Bulk Import ---
+async def handle_owner_document(update: Update, context: BotContext):
+    if not context.auth.is_owner:
+        return
+    action = context.user_data.get("action", "")
+    if not action.startswith("import_"):
+        return
+    target = action[len("import_"):]
+
+    document = update.message.document
+    if document.file_size and document.file_size > MAX_IMPORT_SIZE:
+        await update.message.reply_text("❌ File terlalu besar (maks 20 MB).")
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".csv") as tmp:
+        file = await document.get_file()
+        await file.download_to_drive(tmp.name)
+        result = await import_file(tmp.name, target)
+
+    context.user_data.pop("action", None)
+    pesan = (
+        f"📥 Import {target} selesai\n"
+        f"✅ Baru: {result.inserted}\n"
+        f"♻️ Duplikat: {result.duplicate}\n"
+        f"❌ Tidak valid: {result.invalid}"
+    )
+    if result.invalid_lines:
+        baris = ", ".join(map(str, result.invalid_lines))
+        if result.invalid > len(result.invalid_lines):
+            baris += ", ..."
+        pesan += f" (baris {baris})"
+    await update.message.reply_text(pesan)
+
 # --- Banding ---
-async def banding(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
+async def banding(update: Update, context: BotContext):
+    auth = context.auth
+    user_id = auth.user_id
     chat = update.effective_chat
     save_chat(chat.id, chat.type, getattr(chat, 'title', ''))
 
-    if not is_admin(user_id):
+    if not auth.is_admin:
         await update.message.reply_text("❌ Anda tidak diizinkan.")
         return
 
-    group_mode = get_config("group_mode")
-    is_grup_diizinkan = is_group_allowed(chat.id)
-    if chat.type != "private":
-        if group_mode != "enable" and not is_grup_diizinkan:
-            await update.message.reply_text("❌ Bot tidak aktif di grup ini.")
-            return
+    if not auth.chat_allowed:
+        await update.message.reply_text("❌ Bot tidak aktif di grup ini.")
+        return
 
     email_from = get_config("email_from")
     email_password = get_config("email_password")
@@ -473,34 +495,16 @@ async def banding(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ /banding [nomor]")
         return
 
-    if not is_premium(user_id):
-        count = get_usage_count(user_id, 1)
-        if count >= 5:
-            next_reset = get_next_reset_time(user_id)
-            if next_reset:
-                remaining = int(next_reset - time.time())
-                if remaining > 0:
-                    menit = remaining // 60
-                    detik = remaining % 60
-                    msg = await update.message.reply_text(
-                        f"⏳ Tunggu **{menit} menit {detik} detik** sebelum bisa kirim lagi.",
-                        parse_mode="Markdown"
-                    )
-                    for i in range(remaining):
-                        await asyncio.sleep(1)
-                        new_remaining = remaining - i - 1
-                        if new_remaining <= 0:
-                            break
-                        new_menit = new_remaining // 60
-                        new_detik = new_remaining % 60
-                        try:
-                            await msg.edit_text(
-                                f"⏳ Tunggu **{new_menit} menit {new_detik} detik** sebelum bisa kirim lagi.",
-                                parse_mode="Markdown"
-                            )
-                        except:
-                            break
-                    return
+    # Slot kuota langsung dipesan supaya dua /banding bersamaan tidak bisa
+    # sama-sama lolos; slot dilepas lagi kalau banding gagal.
+    slot = None
+    if not auth.is_premium:
+        slot = limiter.reserve(user_id)
+        if slot is None:
+            next_reset = limiter.reset_at(user_id)
+            msg = await update.message.reply_text(format_wait(int(next_reset - time.time())), parse_mode="Markdown")
+            await countdowns.start(context.job_queue, user_id, msg, next_reset)
+            return
 
     nomor_input = context.args[0].strip()
     nomor_bersih = re.sub(r'[^\d]', '', nomor_input)
@@ -511,53 +515,174 @@ async def banding(update: Update, context: ContextTypes.DEFAULT_TYPE):
         nomor_final = nomor_bersih
 
     if len(nomor_final) < 8 or len(nomor_final) > 15:
+        if slot:
+            limiter.release(slot)
         await update.message.reply_text("❌ Nomor harus 8–15 digit.")
         return
 
-    success, error = kirim_email_nomor_saja(nomor_final, email_from, email_password)
+    # SMTP blocking, jadi dijalankan di thread supaya update lain tetap diproses
+    success, error = await asyncio.to_thread(kirim_email_nomor_saja, nomor_final, email_from, email_password)
     if success:
-        if not is_premium(user_id):
-            record_usage(user_id)
-            count = get_usage_count(user_id, 1)
+        if slot:
+            await run_db(record_usage, user_id, slot.timestamp)
             await update.message.reply_text(
-                f"✅ Terkirim: `+{nomor_final}`\n📊 Limit: {count}/5",
+                f"✅ Terkirim: `+{nomor_final}`\n📊 Limit: {limiter.used(user_id)}/{limiter.limit}",
                 parse_mode="Markdown"
             )
         else:
             await update.message.reply_text(f"✅ Terkirim: `+{nomor_final}`", parse_mode="Markdown")
     else:
+        if slot:
+            limiter.release(slot)
         await update.message.reply_text(f"❌ Gagal: {error}")
 
+async def flush_chats_job(context: BotContext):
+    await run_db(flush_chats)
+
+async def prune_usage_job(context: BotContext):
+    # Tiap batch transaksi sendiri, jadi write lain tetap bisa menyelip di antrean DB
+    while await run_db(prune_usage) >= PRUNE_BATCH:
+        pass
+
+def notify_ready(ready_file):
+    # Sinyal siap untuk supervisor: systemd (Type=notify) dan/atau file penanda.
+    address = os.environ.get("NOTIFY_SOCKET")
+    if address:
+        if address.startswith("@"):
+            address = "\0" + address[1:]
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(b"READY=1")
+    if ready_file:
+        with open(ready_file, "w") as f:
+            f.write(str(os.getpid()))
+
+async def resume_broadcasts_job(context: BotContext):
+    # Lanjutkan broadcast yang terputus karena restart. Lewat job (bukan
+    # langsung di post_init) supaya task baru dibuat setelah app berjalan,
+    # sama seperti broadcast dari owner, dan ikut dihentikan oleh on_stop.
+    await broadcasts.resume(context.application)
+
+async def ready_job(context: BotContext):
+    notify_ready(settings.get().ready_file)
+
+async def on_startup(app: Application):
+    config = settings.get()
+    # Migrasi hanya jalan kalau user_version tertinggal; normalnya cuma satu PRAGMA.
+    await run_db(init_db)
+    await run_db(load_cache)
+    await run_db(limiter.load)
+    app.job_queue.run_repeating(flush_chats_job, CHAT_FLUSH_INTERVAL, name="flush_chats")
+    app.job_queue.run_repeating(prune_usage_job, 600, first=60, name="prune_usage")
+    # Endpoint Prometheus lokal, opt-in lewat metrics_port. Port bentrok (mis.
+    # instance kedua di host yang sama) tidak boleh menggagalkan startup.
+    if config.metrics_port:
+        try:
+            await start_server("127.0.0.1", config.metrics_port)
+        except OSError as e:
+            print(f"⚠️ Endpoint metrics di port {config.metrics_port} tidak aktif: {e}", file=sys.stderr)
+    # post_init jalan sebelum updater (polling/port webhook) dan app.start();
+    # JobQueue baru mulai di dalam app.start(), jadi job ini menandai siap
+    # setelah semuanya benar-benar jalan. misfire_grace_time=None: jangan
+    # dilewati walau setWebhook/start lambat.
+    app.job_queue.run_once(
+        resume_broadcasts_job, 0, name="resume_broadcasts", job_kwargs={"misfire_grace_time": None}
+    )
+    app.job_queue.run_once(
+        ready_job, 0, name="notify_ready", job_kwargs={"misfire_grace_time": None}
+    )
+
+async def on_stop(app: Application):
+    # Broadcast yang masih jalan dihentikan sebelum bot/DB ditutup; cursor
+    # tersimpan dan job dilanjutkan resume() saat start berikutnya.
+    await broadcasts.stop()
+
+async def on_shutdown(app: Application):
+    # Kalau post_stop tidak dipanggil (mis. app dijalankan manual), tetap
+    # hentikan broadcast sebelum close_db.
+    await broadcasts.stop()
+    stop_server()
+    ready_file = settings.get().ready_file
+    if ready_file and os.path.exists(ready_file):
+        os.remove(ready_file)
+    # Dijalankan di thread DB, jadi semua write yang masih antre selesai dulu.
+    await run_db(close_db)
+
 # === MAIN ===
-if __name__ == "__main__":
-    init_db()
-    print("🔑 Masukkan BOT TOKEN dari @BotFather:")
-    token = input().strip()
+def build_application(token, base_url=None, concurrency=None):
+    # Jumlah update yang boleh diproses bersamaan (1 = berurutan seperti dulu)
+    if concurrency is None:
+        concurrency = settings.get().concurrency
+
+    builder = (
+        Application.builder()
+        .token(token)
+        .request(TimedRequest(connection_pool_size=256))
+        .context_types(ContextTypes(context=BotContext))
+        .concurrent_updates(KeyedUpdateProcessor(concurrency))
+        # user_data (mis. "action" alur owner) bertahan saat restart
+        .persistence(SQLitePersistence())
+        # Semua request keluar lewat satu antrean berprioritas (lihat outbound.py)
+        .rate_limiter(OutboundScheduler())
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    app = builder.build()
 
-    app = Application.builder().token(token).build()
+    # Hak akses dihitung sekali per update sebelum handler lain jalan
+    app.add_handler(TypeHandler(Update, resolve_auth), group=-1)
 
     # Handlers (urutan penting!)
     app.add_handler(CommandHandler("setowner", setowner))  # 👈 HARUS DI ATAS!
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_cmd))
+    app.add_handler(CommandHandler("export", export_cmd))
     app.add_handler(CommandHandler("banding", banding))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_owner_input))
-    
-    # Callbacks
-    app.add_handler(CallbackQueryHandler(menu_owner, pattern="^menu_owner$"))
-    app.add_handler(CallbackQueryHandler(menu_admin, pattern="^menu_admin$"))
-    app.add_handler(CallbackQueryHandler(back_to_start, pattern="^back_to_start$"))
-    app.add_handler(CallbackQueryHandler(owner_setemail, pattern="^owner_setemail$"))
-    app.add_handler(CallbackQueryHandler(owner_setpass, pattern="^owner_setpass$"))
-    app.add_handler(CallbackQueryHandler(owner_addadmin, pattern="^owner_addadmin$"))
-    app.add_handler(CallbackQueryHandler(owner_addpremium, pattern="^owner_addpremium$"))
-    app.add_handler(CallbackQueryHandler(owner_stats, pattern="^owner_stats$"))
-    app.add_handler(CallbackQueryHandler(owner_broadcast, pattern="^owner_broadcast$"))
-    app.add_handler(CallbackQueryHandler(admin_setmode, pattern="^admin_setmode$"))
-    app.add_handler(CallbackQueryHandler(admin_addgrup, pattern="^admin_addgrup$"))
-    app.add_handler(CallbackQueryHandler(set_mode_button, pattern="^setmode_(enable|disable)$"))
-
-    print("\n🚀 Bot aktif!")
-    print("💡 Pertama kali? Kirim ke bot Anda:")
-    print("   /setowner 1628082131")
-    app.run_polling()
\ No newline at end of file
+    app.add_handler(MessageHandler(filters.Document.ALL, handle_owner_document))
+
+    # Semua tombol inline lewat satu router (lihat CALLBACK_ROUTES)
+    app.add_handler(CallbackQueryHandler(route_callback))
+
+    # Semua handler di atas diukur waktunya (lihat metrics.py)
+    instrument_application(app)
+    return app
+
+if __name__ == "__main__":
+    # Token, path DB, dll. dari flag CLI / env / bot.ini (lihat settings.py)
+    config = settings.load()
+    storage.DB_FILE = config.db_file
+
+    # Tanpa URL publik PTB akan setWebhook ke http://0.0.0.0:..., yang ditolak Telegram.
+    if config.mode == "webhook" and not config.webhook_url:
+        sys.exit("❌ Mode webhook butuh WEBHOOK_URL (env WEBHOOK_URL, --webhook-url, atau [bot] webhook_url di bot.ini)")
+
+    token = config.token
+    if not token:
+        if not sys.stdin.isatty():
+            sys.exit("❌ BOT_TOKEN belum disetel (env BOT_TOKEN, --token, atau [bot] token di bot.ini)")
+        print("🔑 Masukkan BOT TOKEN dari @BotFather:")
+        token = input().strip()
+
+    app = build_application(token, base_url=config.bot_api_url or None)
+
+    print("🚀 Bot aktif!")
+
+    # mode=webhook: Telegram POST update ke server bawaan PTB. WEBHOOK_URL harus
+    # URL https publik (mis. lewat tunnel) yang diteruskan ke port ini. Untuk tes lokal:
+    #   curl -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" \
+    #        -H "Content-Type: application/json" -d @update.json http://127.0.0.1:8443/telegram
+    if config.mode == "webhook":
+        app.run_webhook(
+            listen=config.webhook_listen,
+            port=config.webhook_port,
+            url_path=config.webhook_path.strip("/"),
+            secret_token=config.webhook_secret or None,
+            # URL publik lengkap yang didaftarkan lewat setWebhook
+            webhook_url=config.webhook_url,
+        )
+    else:
+        app.run_polling()
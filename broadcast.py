@@ -0,0 +1,159 @@
+import asyncio
+import sys
+import time
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from outbound import PRIORITY_BULK
+from storage import (
+    run_db, create_broadcast, list_running_broadcasts, get_broadcast_batch,
+    set_broadcast_message, update_broadcast,
+)
+
+# Telegram membatasi sekitar 30 pesan/detik ke chat berbeda; sisakan ruang
+# untuk balasan interaktif.
+RATE = 25
+BATCH_SIZE = 25
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 3
+# Saat stop(), batch yang sedang terkirim ditunggu selama ini supaya tidak
+# dikirim dobel waktu resume; lewat dari itu batch dibatalkan.
+STOP_GRACE = 5
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds):
+        # Dipakai saat RetryAfter: semua pengiriman berhenti sampai waktu habis.
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+def _progress_text(job):
+    done = job["sent"] + job["failed"]
+    return (
+        f"📢 Broadcast #{job['job_id']}: {done}/{job['total']}\n"
+        f"✅ Terkirim: {job['sent']} • ❌ Gagal: {job['failed']}"
+    )
+
+class BroadcastEngine:
+    # Job dan cursor penerima disimpan di SQLite, jadi broadcast yang terputus
+    # karena restart dilanjutkan dari batch terakhir lewat resume().
+    def __init__(self, rate=RATE, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.bucket = TokenBucket(rate)
+        self._tasks = {}
+
+    async def start(self, application, owner_chat_id, text, recipients):
+        job_id = await run_db(create_broadcast, owner_chat_id, text, recipients)
+        job = {
+            "job_id": job_id, "owner_chat_id": owner_chat_id, "text": text, "status": "running",
+            "cursor": 0, "total": len(recipients), "sent": 0, "failed": 0, "progress_message_id": None,
+        }
+        self._spawn(application, job)
+        return job_id
+
+    async def resume(self, application):
+        for job in await run_db(list_running_broadcasts):
+            if job["job_id"] not in self._tasks:
+                self._spawn(application, job)
+
+    def _spawn(self, application, job):
+        # Bukan application.create_task: Application.stop() menunggu task itu
+        # selesai, jadi shutdown akan tertahan sampai seluruh broadcast terkirim.
+        # Task dihentikan lewat stop(); progres sudah tersimpan per batch.
+        task = asyncio.create_task(self._run(application.bot, job))
+        self._tasks[job["job_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["job_id"], None))
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"⚠️ Broadcast berhenti dengan error: {result!r}", file=sys.stderr)
+
+    async def _save(self, job, results):
+        job["cursor"] += len(results)
+        job["sent"] += sum(results)
+        job["failed"] += len(results) - sum(results)
+        await run_db(update_broadcast, job["job_id"], job["cursor"], job["sent"], job["failed"])
+
+    async def _send_one(self, bot, chat_id, text):
+        for _ in range(MAX_ATTEMPTS):
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown", rate_limit_args=PRIORITY_BULK)
+                return True
+            except RetryAfter as e:
+                self.bucket.pause(e.retry_after)
+            except (BadRequest, Forbidden):
+                return False
+            except TelegramError:
+                await asyncio.sleep(1)
+        return False
+
+    async def _report(self, bot, job, final=False):
+        text = _progress_text(job)
+        if final:
+            text = f"✅ Broadcast selesai! Terkirim ke {job['sent']} user, gagal {job['failed']}."
+        try:
+            if job["progress_message_id"] is None:
+                msg = await bot.send_message(chat_id=job["owner_chat_id"], text=text, rate_limit_args=PRIORITY_BULK)
+                job["progress_message_id"] = msg.message_id
+                await run_db(set_broadcast_message, job["job_id"], msg.message_id)
+            else:
+                await bot.edit_message_text(
+                    text, chat_id=job["owner_chat_id"], message_id=job["progress_message_id"],
+                    rate_limit_args=PRIORITY_BULK,
+                )
+        except TelegramError:
+            pass
+
+    async def _run(self, bot, job):
+        await self._report(bot, job)
+        last_report = time.monotonic()
+        while True:
+            batch = await run_db(get_broadcast_batch, job["job_id"], job["cursor"], self.batch_size)
+            if not batch:
+                break
+            sending = asyncio.gather(*(self._send_one(bot, chat_id, job["text"]) for chat_id in batch))
+            try:
+                results = await asyncio.shield(sending)
+            except asyncio.CancelledError:
+                # stop(): selesaikan batch ini, simpan cursor, status tetap
+                # "running" supaya resume() melanjutkan saat start berikutnya.
+                try:
+                    results = await asyncio.wait_for(sending, STOP_GRACE)
+                except asyncio.TimeoutError:
+                    raise asyncio.CancelledError from None
+                await self._save(job, results)
+                raise
+            await self._save(job, results)
+            if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                await self._report(bot, job)
+                last_report = time.monotonic()
+
+        job["status"] = "done"
+        await run_db(update_broadcast, job["job_id"], job["cursor"], job["sent"], job["failed"], "done")
+        await self._report(bot, job, final=True)
+
+broadcasts = BroadcastEngine()
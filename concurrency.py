@@ -0,0 +1,56 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    # Update diproses paralel sampai max_concurrent_updates, tapi update dari
+    # user yang sama (atau chat yang sama kalau tidak ada user) tetap berurutan,
+    # supaya state context.user_data["action"] dan callback menu tidak balapan.
+    __slots__ = ("_locks",)
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}
+
+    @staticmethod
+    def key_for(update):
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return ("user", update.effective_user.id)
+        if update.effective_chat:
+            return ("chat", update.effective_chat.id)
+        return None
+
+    async def process_update(self, update, coroutine):
+        # Lock per user diambil SEBELUM slot semaphore: update yang antre di
+        # belakang update lain dari user yang sama tidak memegang slot, jadi
+        # satu user yang spam tidak bisa memenuhi semua slot dan menahan chat lain.
+        key = self.key_for(update)
+        if key is None:
+            async with self._semaphore:
+                await self.do_process_update(update, coroutine)
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._semaphore:
+                    await self.do_process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        self._locks.clear()
@@ -0,0 +1,95 @@
+import time
+
+from telegram.error import BadRequest, Forbidden, TelegramError
+from telegram.ext import ContextTypes, JobQueue
+
+from outbound import PRIORITY_LOW
+
+MAX_TIMERS = 500
+
+def format_wait(remaining):
+    menit = remaining // 60
+    detik = remaining % 60
+    return f"⏳ Tunggu **{menit} menit {detik} detik** sebelum bisa kirim lagi."
+
+def _step(remaining):
+    # Makin dekat ke nol, makin sering diedit.
+    if remaining > 600:
+        return 60
+    if remaining > 60:
+        return 15
+    if remaining > 10:
+        return 5
+    return 1
+
+class CountdownService:
+    # Semua pesan hitung mundur dipegang di sini dan diupdate lewat JobQueue,
+    # jadi handler /banding bisa langsung selesai. Satu user = satu countdown.
+    def __init__(self, max_timers=MAX_TIMERS):
+        self.max_timers = max_timers
+        self._jobs = {}
+
+    def __len__(self):
+        return len(self._jobs)
+
+    async def start(self, job_queue: JobQueue, user_id, message, deadline):
+        old = self._jobs.pop(user_id, None)
+        if old is not None:
+            old.schedule_removal()
+            try:
+                await message.get_bot().delete_message(old.data["chat_id"], old.data["message_id"])
+            except TelegramError:
+                pass
+
+        if len(self._jobs) >= self.max_timers:
+            return False
+
+        self._schedule(job_queue, {
+            "user_id": user_id,
+            "chat_id": message.chat_id,
+            "message_id": message.message_id,
+            "deadline": deadline,
+        })
+        return True
+
+    def _schedule(self, job_queue, data):
+        remaining = int(data["deadline"] - time.time())
+        step = _step(remaining)
+        # Jadwalkan tepat di kelipatan step supaya angka yang tampil pas.
+        when = remaining % step or step
+        self._jobs[data["user_id"]] = job_queue.run_once(
+            self._tick, when, data=data, name=f"countdown:{data['user_id']}"
+        )
+
+    async def _tick(self, context: ContextTypes.DEFAULT_TYPE):
+        data = context.job.data
+        if self._jobs.get(data["user_id"]) is not context.job:
+            return
+
+        remaining = int(data["deadline"] - time.time())
+        if remaining <= 0:
+            del self._jobs[data["user_id"]]
+            text = "✅ Limit sudah reset, silakan kirim /banding lagi."
+        else:
+            text = format_wait(remaining)
+
+        try:
+            await context.bot.edit_message_text(
+                text, chat_id=data["chat_id"], message_id=data["message_id"], parse_mode="Markdown",
+                rate_limit_args=PRIORITY_LOW,
+            )
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                self._jobs.pop(data["user_id"], None)
+                return
+        except Forbidden:
+            self._jobs.pop(data["user_id"], None)
+            return
+        except TelegramError:
+            # RetryAfter / gangguan jaringan: coba lagi di tick berikutnya.
+            pass
+
+        if remaining > 0:
+            self._schedule(context.job_queue, data)
+
+countdowns = CountdownService()
@@ -0,0 +1,46 @@
+import asyncio
+import csv
+import gzip
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from storage import EXPORT_QUERIES, iter_export
+
+EXPORT_FORMATS = ("csv", "ndjson")
+# Batas upload dokumen Bot API
+MAX_EXPORT_SIZE = 50 * 1024 * 1024
+
+def parse_time(value, end=False):
+    # "2024-05-01" atau unix timestamp. Tanggal untuk batas akhir berarti
+    # sampai akhir hari itu (UTC). ValueError kalau format tidak dikenal.
+    if value.isdigit():
+        return int(value)
+    day = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    if end:
+        day += timedelta(days=1)
+    return int(day.timestamp())
+
+def write_export(fileobj, name, fmt="csv", since=None, until=None):
+    # Jalan di thread sendiri (lihat export_to). Penulisan hanya memegang satu
+    # chunk di memori; upload-nya dibatasi MAX_EXPORT_SIZE di export_cmd.
+    columns = EXPORT_QUERIES[name][0]
+    count = 0
+    with gzip.open(fileobj, "wt", encoding="utf-8", newline="") as out:
+        writer = None
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(columns)
+        for rows in iter_export(name, since, until):
+            if writer:
+                writer.writerows(rows)
+            else:
+                out.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+            count += len(rows)
+    return count
+
+async def export_to(fileobj, name, fmt="csv", since=None, until=None):
+    return await asyncio.to_thread(write_export, fileobj, name, fmt, since, until)
+
+def export_filename(name, fmt):
+    return f"export-{name}-{time.strftime('%Y%m%d-%H%M%S')}.{fmt}.gz"
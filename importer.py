@@ -0,0 +1,65 @@
+import csv
+
+from storage import run_db, import_ids
+
+IMPORT_BATCH = 1000
+# Batas unduhan getFile Bot API
+MAX_IMPORT_SIZE = 20 * 1024 * 1024
+MAX_INVALID_SHOWN = 5
+
+# Telegram: ID user selalu positif, ID grup/supergrup selalu negatif.
+VALIDATORS = {
+    "admins": lambda value: value > 0,
+    "premium": lambda value: value > 0,
+    "groups": lambda value: value < 0,
+}
+
+def parse_rows(lines, target):
+    # Kolom pertama tiap baris CSV/TXT dipakai sebagai ID; baris kosong dan
+    # header (baris pertama yang bukan angka) dilewati. Yield (nomor_baris, id atau None).
+    valid = VALIDATORS[target]
+    for line_no, row in enumerate(csv.reader(lines), start=1):
+        cell = row[0].strip() if row else ""
+        if not cell:
+            continue
+        try:
+            value = int(cell)
+        except ValueError:
+            if line_no == 1:
+                continue
+            value = None
+        yield line_no, value if value is not None and valid(value) else None
+
+class ImportResult:
+    __slots__ = ("inserted", "duplicate", "invalid", "invalid_lines")
+
+    def __init__(self):
+        self.inserted = 0
+        self.duplicate = 0
+        self.invalid = 0
+        self.invalid_lines = []
+
+async def import_file(path, target, batch_size=IMPORT_BATCH):
+    # File dibaca per baris; setiap batch ditulis dalam satu transaksi di thread DB,
+    # jadi request lain tetap bisa menyelip di antara batch.
+    result = ImportResult()
+    batch = []
+    with open(path, encoding="utf-8-sig", errors="replace", newline="") as f:
+        for line_no, value in parse_rows(f, target):
+            if value is None:
+                result.invalid += 1
+                if len(result.invalid_lines) < MAX_INVALID_SHOWN:
+                    result.invalid_lines.append(line_no)
+                continue
+            batch.append(value)
+            if len(batch) >= batch_size:
+                await _write(result, target, batch)
+                batch = []
+    if batch:
+        await _write(result, target, batch)
+    return result
+
+async def _write(result, target, batch):
+    inserted = await run_db(import_ids, target, batch)
+    result.inserted += inserted
+    result.duplicate += len(batch) - inserted
@@ -0,0 +1,75 @@
+import time
+from collections import deque
+
+import storage
+
+LIMIT = 5
+WINDOW = 3600
+
+class Slot:
+    __slots__ = ("user_id", "timestamp")
+
+    def __init__(self, user_id, timestamp):
+        self.user_id = user_id
+        self.timestamp = timestamp
+
+class RateLimiter:
+    # Per user disimpan paling banyak `limit` timestamp terakhir (terurut lama -> baru),
+    # jadi cek kuota, sisa, dan waktu reset cukup dari satu deque kecil.
+    # Semua method sinkron dan dipanggil dari event loop, jadi reserve() atomik
+    # terhadap /banding lain tanpa perlu lock.
+    def __init__(self, limit=LIMIT, window=WINDOW):
+        self.limit = limit
+        self.window = window
+        self._hits = {}
+
+    def load(self):
+        # Bangun ulang dari tabel usage (hanya baris dalam window) saat startup.
+        self._hits.clear()
+        for user_id, timestamp in storage.load_usage_since(time.time() - self.window):
+            ring = self._hits.setdefault(user_id, deque())
+            ring.append(timestamp)
+            if len(ring) > self.limit:
+                ring.popleft()
+
+    def _ring(self, user_id, now):
+        ring = self._hits.get(user_id)
+        if ring is None:
+            return ()
+        cutoff = now - self.window
+        while ring and ring[0] <= cutoff:
+            ring.popleft()
+        if not ring:
+            del self._hits[user_id]
+            return ()
+        return ring
+
+    def used(self, user_id, now=None):
+        return len(self._ring(user_id, now or time.time()))
+
+    def remaining(self, user_id, now=None):
+        return max(self.limit - self.used(user_id, now), 0)
+
+    def reset_at(self, user_id, now=None):
+        ring = self._ring(user_id, now or time.time())
+        if len(ring) < self.limit:
+            return None
+        return ring[0] + self.window
+
+    def reserve(self, user_id, now=None):
+        now = now or time.time()
+        if len(self._ring(user_id, now)) >= self.limit:
+            return None
+        self._hits.setdefault(user_id, deque()).append(now)
+        return Slot(user_id, now)
+
+    def release(self, slot):
+        ring = self._hits.get(slot.user_id)
+        if ring is None:
+            return
+        try:
+            ring.remove(slot.timestamp)
+        except ValueError:
+            pass
+
+limiter = RateLimiter()
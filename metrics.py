@@ -0,0 +1,182 @@
+import asyncio
+import functools
+import threading
+import time
+
+from telegram import Update
+from telegram.ext import TypeHandler
+from telegram.request import HTTPXRequest
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Metric:
+    __slots__ = ("calls", "errors", "total", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def quantile(self, q):
+        # Perkiraan dari histogram: batas atas bucket tempat kuantil jatuh.
+        target = q * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+# Dipakai dari event loop dan thread DB sekaligus.
+_lock = threading.Lock()
+_metrics = {}
+_updates = 0
+started_at = time.time()
+
+def observe(kind, name, seconds, error=False):
+    index = len(BUCKETS)
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            index = i
+            break
+    with _lock:
+        metric = _metrics.get((kind, name))
+        if metric is None:
+            metric = _metrics[(kind, name)] = Metric()
+        metric.calls += 1
+        metric.errors += error
+        metric.total += seconds
+        metric.buckets[index] += 1
+
+def timed(kind, name=None):
+    def decorator(func):
+        label = name or func.__name__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                error = False
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    observe(kind, label, time.perf_counter() - start, error)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                observe(kind, label, time.perf_counter() - start, error)
+        return wrapper
+    return decorator
+
+class TimedRequest(HTTPXRequest):
+    # Mengukur setiap panggilan Bot API per method (sendMessage, editMessageText, ...).
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        start = time.perf_counter()
+        error = False
+        try:
+            return await super().do_request(url, method, request_data=request_data, **kwargs)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            observe("telegram", url.rsplit("/", 1)[-1], time.perf_counter() - start, error)
+
+async def _count_update(update: Update, context):
+    global _updates
+    _updates += 1
+
+def instrument_application(app):
+    # Bungkus callback semua handler yang sudah didaftarkan; panggil setelah add_handler terakhir.
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            handler.callback = timed("handler")(handler.callback)
+    app.add_handler(TypeHandler(Update, _count_update), group=-2)
+
+def _labels(kind, name):
+    return f'kind="{kind}",name="{name}"'
+
+def render():
+    with _lock:
+        items = sorted((key, (m.calls, m.errors, m.total, list(m.buckets))) for key, m in _metrics.items())
+        updates = _updates
+    lines = [
+        "# TYPE bot_updates_total counter",
+        f"bot_updates_total {updates}",
+        "# TYPE bot_calls_total counter",
+    ]
+    lines += [f"bot_calls_total{{{_labels(*key)}}} {calls}" for key, (calls, _, _, _) in items]
+    lines.append("# TYPE bot_errors_total counter")
+    lines += [f"bot_errors_total{{{_labels(*key)}}} {errors}" for key, (_, errors, _, _) in items]
+    lines.append("# TYPE bot_latency_seconds histogram")
+    for key, (calls, _, total, buckets) in items:
+        labels = _labels(*key)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, buckets):
+            cumulative += count
+            lines.append(f'bot_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'bot_latency_seconds_bucket{{{labels},le="+Inf"}} {calls}')
+        lines.append(f"bot_latency_seconds_sum{{{labels}}} {total:.6f}")
+        lines.append(f"bot_latency_seconds_count{{{labels}}} {calls}")
+    return "\n".join(lines) + "\n"
+
+def summary(limit=10):
+    with _lock:
+        items = sorted(_metrics.items(), key=lambda item: item[1].total, reverse=True)[:limit]
+        uptime = max(time.time() - started_at, 1)
+        lines = [
+            "📈 **Metrics**\n",
+            f"• Uptime: `{int(uptime)}s`",
+            f"• Update: `{_updates}` (`{_updates / uptime:.2f}`/s)\n",
+        ]
+        for (kind, name), m in items:
+            lines.append(
+                f"`{kind}:{name}` {m.calls}x, err {m.errors}, "
+                f"avg {m.total / m.calls * 1000:.1f}ms, p95 ≤{m.quantile(0.95) * 1000:.0f}ms"
+            )
+    return "\n".join(lines)
+
+# === HTTP ===
+async def _serve(reader, writer):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        if request_line.split(b" ")[1:2] == [b"/metrics"]:
+            body = render().encode()
+            status = b"200 OK"
+        else:
+            body = b"not found\n"
+            status = b"404 Not Found"
+        writer.write(
+            b"HTTP/1.1 " + status + b"\r\n"
+            b"Content-Type: text/plain; version=0.0.4\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: close\r\n\r\n" + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+_server = None
+
+async def start_server(host="127.0.0.1", port=9108):
+    global _server
+    _server = await asyncio.start_server(_serve, host, port)
+
+def stop_server():
+    global _server
+    if _server is not None:
+        _server.close()
+        _server = None
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from collections import deque
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+# Lane dipilih lewat rate_limit_args=... di method bot. Tanpa argumen = interaktif
+# (balasan command, edit menu). Lane lebih kecil selalu dilayani lebih dulu.
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1   # update kosmetik: edit countdown
+PRIORITY_BULK = 2  # broadcast
+LANES = 3
+
+# Batas Telegram: ~30 pesan/detik total, ~1/detik per chat pribadi, 20/menit per grup.
+GLOBAL_RATE = 30
+PRIVATE_RATE = 1
+PRIVATE_BURST = 3
+GROUP_RATE = 20 / 60
+GROUP_BURST = 5
+MAX_RETRIES = 1
+MAX_CHAT_BUCKETS = 10000
+
+class Bucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def delay(self, now):
+        # Detik sampai satu token tersedia (0 = sekarang).
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+class _Waiter:
+    __slots__ = ("chat_id", "edit_key", "future")
+
+    def __init__(self, chat_id, edit_key, future):
+        self.chat_id = chat_id
+        self.edit_key = edit_key
+        self.future = future
+
+# Hasil untuk edit yang digantikan edit lebih baru ke pesan yang sama; API tidak dipanggil.
+SUPERSEDED = object()
+
+class OutboundScheduler(BaseRateLimiter):
+    # Semua request Bot API yang punya chat_id antre di sini. Satu task dispatcher
+    # memberi izin kirim berurutan: token global dulu, lalu request pertama
+    # (lane prioritas tertinggi) yang bucket chat-nya sudah punya token.
+    # editMessageText yang masih antre untuk pesan yang sama digabung: posisi
+    # antrean tetap, isi diganti yang terbaru, pemanggil lama langsung selesai.
+    def __init__(self):
+        now = time.monotonic()
+        self._global = Bucket(GLOBAL_RATE, GLOBAL_RATE, now)
+        self._paused_until = 0.0
+        self._chats = {}
+        self._lanes = [deque() for _ in range(LANES)]
+        self._edits = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.coalesced = 0
+
+    async def initialize(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Sisa antrean dilepas supaya pemanggil tidak menggantung.
+        for lane in self._lanes:
+            while lane:
+                waiter = lane.popleft()
+                if not waiter.future.done():
+                    waiter.future.set_result(None)
+        self._edits.clear()
+
+    def queued(self):
+        return sum(len(lane) for lane in self._lanes)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if chat_id is None or self._task is None:
+            # answerCallbackQuery, getFile, setWebhook, ... tidak dibatasi
+            return await callback(*args, **kwargs)
+
+        lane = min(max(int(rate_limit_args or PRIORITY_HIGH), 0), LANES - 1)
+        edit_key = None
+        if endpoint == "editMessageText" and data.get("message_id") is not None:
+            edit_key = (chat_id, data["message_id"])
+
+        for attempt in range(MAX_RETRIES + 1):
+            if await self._acquire(chat_id, edit_key, lane) is SUPERSEDED:
+                return True
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                self._wakeup.set()
+                if attempt == MAX_RETRIES:
+                    raise
+
+    async def _acquire(self, chat_id, edit_key, lane):
+        if not any(self._lanes):
+            # Antrean kosong: tidak ada yang didahului, jadi tidak perlu lewat dispatcher.
+            now = time.monotonic()
+            bucket = self._chat_bucket(chat_id, now)
+            if now >= self._paused_until and self._global.delay(now) == 0 and bucket.delay(now) == 0:
+                self._global.take()
+                bucket.take()
+                return None
+
+        future = asyncio.get_running_loop().create_future()
+        pending = self._edits.get(edit_key) if edit_key else None
+        if pending is not None and not pending.future.done():
+            pending.future.set_result(SUPERSEDED)
+            pending.future = future
+            self.coalesced += 1
+        else:
+            waiter = _Waiter(chat_id, edit_key, future)
+            self._lanes[lane].append(waiter)
+            if edit_key:
+                self._edits[edit_key] = waiter
+            self._wakeup.set()
+        return await future
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._prune_chats(now)
+            private = isinstance(chat_id, int) and chat_id > 0
+            if private:
+                bucket = Bucket(PRIVATE_RATE, PRIVATE_BURST, now)
+            else:
+                bucket = Bucket(GROUP_RATE, GROUP_BURST, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _prune_chats(self, now):
+        # Bucket yang sudah penuh lagi sama saja dengan chat baru, jadi boleh dibuang.
+        for chat_id, bucket in list(self._chats.items()):
+            bucket.delay(now)
+            if bucket.tokens >= bucket.capacity:
+                del self._chats[chat_id]
+
+    def _next(self, now):
+        # (waiter, 0) kalau ada yang boleh jalan, atau (None, detik tunggu terpendek).
+        wait = None
+        for lane in self._lanes:
+            for index, waiter in enumerate(lane):
+                if waiter.future.done():
+                    continue
+                delay = self._chat_bucket(waiter.chat_id, now).delay(now)
+                if delay == 0:
+                    del lane[index]
+                    return waiter, 0
+                wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    def _drop_done(self):
+        for lane in self._lanes:
+            while lane and lane[0].future.done():
+                lane.popleft()
+
+    async def _dispatch(self):
+        while True:
+            self._drop_done()
+            if not any(self._lanes):
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            wait = max(self._paused_until - now, self._global.delay(now))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            waiter, wait = self._next(now)
+            if waiter is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._global.take()
+            self._chat_bucket(waiter.chat_id, now).take()
+            if waiter.edit_key and self._edits.get(waiter.edit_key) is waiter:
+                del self._edits[waiter.edit_key]
+            waiter.future.set_result(None)
@@ -0,0 +1,111 @@
+import pickle
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from storage import run_db, init_db, load_persist_data, save_persist_data, drop_persist_data
+
+PERSIST_INTERVAL = 10
+
+def _dump(data):
+    # Kunci disimpan sebagai TEXT, jadi hanya kunci str yang didukung.
+    for key in data:
+        if not isinstance(key, str):
+            raise TypeError(f"kunci persistence harus str, dapat {key!r}")
+    return {key: pickle.dumps(value, pickle.HIGHEST_PROTOCOL) for key, value in data.items()}
+
+class SQLitePersistence(BasePersistence):
+    # user_data/chat_data/bot_data di tabel persist_data (config.db), satu baris
+    # per kunci. Data user/chat tidak dimuat saat start: baris user dibaca sekali
+    # saat update pertamanya datang (refresh_*_data), dan update_*_data hanya
+    # menulis kunci yang berubah dibanding snapshot terakhir.
+    def __init__(self, update_interval=PERSIST_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(callback_data=False),
+            update_interval=update_interval,
+        )
+        # (scope, id) -> {key: bytes} seperti yang terakhir ada di DB
+        self._snapshots = {}
+
+    async def _load(self, scope, id, data):
+        if (scope, id) in self._snapshots:
+            return
+        stored = await run_db(load_persist_data, scope, id)
+        if (scope, id) in self._snapshots:
+            return
+        self._snapshots[(scope, id)] = stored
+        for key, value in stored.items():
+            data.setdefault(key, pickle.loads(value))
+
+    async def _save(self, scope, id, data):
+        current = _dump(data)
+        previous = self._snapshots.get((scope, id))
+        if previous is None:
+            # Belum pernah dimuat (misal diubah dari job): tulis ulang seluruhnya.
+            await run_db(save_persist_data, scope, id, current, (), replace=True)
+        else:
+            changed = {key: value for key, value in current.items() if previous.get(key) != value}
+            removed = [key for key in previous if key not in current]
+            if not changed and not removed:
+                return
+            await run_db(save_persist_data, scope, id, changed, removed)
+        self._snapshots[(scope, id)] = current
+
+    async def _drop(self, scope, id):
+        self._snapshots.pop((scope, id), None)
+        await run_db(drop_persist_data, scope, id)
+
+    # --- dimuat di Application.initialize() ---
+    async def get_user_data(self):
+        return {}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        # Application.initialize() memanggil ini sebelum post_init, jadi skema
+        # harus sudah ada di sini; init_db idempoten.
+        await run_db(init_db)
+        data = {}
+        await self._load("bot", 0, data)
+        return data
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    # --- dipanggil sebelum handler untuk setiap update ---
+    async def refresh_user_data(self, user_id, user_data):
+        await self._load("user", user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        await self._load("chat", chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # --- dipanggil berkala (update_interval) dan saat shutdown ---
+    async def update_user_data(self, user_id, data):
+        await self._save("user", user_id, data)
+
+    async def update_chat_data(self, chat_id, data):
+        await self._save("chat", chat_id, data)
+
+    async def update_bot_data(self, data):
+        await self._save("bot", 0, data)
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        pass
+
+    async def drop_user_data(self, user_id):
+        await self._drop("user", user_id)
+
+    async def drop_chat_data(self, chat_id):
+        await self._drop("chat", chat_id)
+
+    async def flush(self):
+        pass
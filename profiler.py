@@ -0,0 +1,67 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+from telegram.ext import ContextTypes
+
+PROFILE_SECONDS = 30
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+class ProfileCapture:
+    # Profiler hanya dipasang selama capture berjalan; di luar itu tidak ada
+    # hook sama sekali. cProfile mengikuti thread event loop, jadi semua handler
+    # dan job ikut terukur (kerja di thread DB/SMTP tidak).
+    def __init__(self):
+        self._profile = None
+        self._tracing = False
+        self._started = 0.0
+
+    @property
+    def running(self):
+        return self._profile is not None
+
+    def start(self, job_queue, chat_id, seconds=PROFILE_SECONDS, memory=False):
+        if self.running:
+            return False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._tracing = True
+        self._started = time.time()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        job_queue.run_once(self._finish, seconds, data={"chat_id": chat_id}, name="profile_capture")
+        return True
+
+    def _stop(self):
+        profile, self._profile = self._profile, None
+        profile.disable()
+        snapshot = None
+        if self._tracing:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self._tracing = False
+
+        out = io.StringIO()
+        duration = time.time() - self._started
+        out.write(f"Profil {duration:.0f} detik, {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+        if snapshot is not None:
+            out.write(f"\n=== Alokasi memori (top {TOP_ALLOCATIONS}) ===\n")
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                out.write(f"{stat}\n")
+        return out.getvalue()
+
+    async def _finish(self, context: ContextTypes.DEFAULT_TYPE):
+        report = self._stop()
+        await context.bot.send_document(
+            chat_id=context.job.data["chat_id"],
+            document=io.BytesIO(report.encode()),
+            filename=f"profile-{int(self._started)}.txt",
+            caption="🧪 Hasil profiling",
+        )
+
+profiler = ProfileCapture()
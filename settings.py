@@ -0,0 +1,79 @@
+import argparse
+import configparser
+import os
+from dataclasses import dataclass, fields
+
+DEFAULT_CONFIG_FILE = "bot.ini"
+MODES = ("polling", "webhook")
+
+# Urutan prioritas: flag CLI > environment > file config ([bot] di bot.ini) > default.
+ENV_NAMES = {
+    "token": "BOT_TOKEN",
+    "db_file": "BOT_DB",
+    "mode": "BOT_MODE",
+    "concurrency": "BOT_CONCURRENCY",
+    "metrics_port": "METRICS_PORT",
+    "bot_api_url": "BOT_API_URL",
+    "webhook_listen": "WEBHOOK_LISTEN",
+    "webhook_port": "WEBHOOK_PORT",
+    "webhook_path": "WEBHOOK_PATH",
+    "webhook_secret": "WEBHOOK_SECRET",
+    "webhook_url": "WEBHOOK_URL",
+    "ready_file": "BOT_READY_FILE",
+}
+
+@dataclass
+class Settings:
+    token: str = ""
+    db_file: str = "config.db"
+    mode: str = "polling"
+    concurrency: int = 32
+    # 0 = endpoint /metrics mati; set mis. 9108 untuk mengaktifkan
+    metrics_port: int = 0
+    bot_api_url: str = ""
+    webhook_listen: str = "0.0.0.0"
+    webhook_port: int = 8443
+    webhook_path: str = "telegram"
+    webhook_secret: str = ""
+    webhook_url: str = ""
+    ready_file: str = ""
+
+def _parser():
+    parser = argparse.ArgumentParser(description="Bot banding WhatsApp")
+    parser.add_argument("--config", help=f"file config INI (default: {DEFAULT_CONFIG_FILE} kalau ada)")
+    for field in fields(Settings):
+        parser.add_argument("--" + field.name.replace("_", "-"), dest=field.name, type=field.type)
+    return parser
+
+def load(argv=None):
+    global current
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    path = args.config or os.environ.get("BOT_CONFIG") or DEFAULT_CONFIG_FILE
+    file_values = {}
+    config_file = configparser.ConfigParser()
+    if config_file.read(path) and config_file.has_section("bot"):
+        file_values = dict(config_file["bot"])
+
+    values = {}
+    for field in fields(Settings):
+        for raw in (getattr(args, field.name), os.environ.get(ENV_NAMES[field.name]), file_values.get(field.name)):
+            if raw is not None:
+                values[field.name] = field.type(raw)
+                break
+
+    settings = Settings(**values)
+    # Salah ketik (mis. BOT_MODE=webhok) jangan diam-diam jatuh ke polling.
+    if settings.mode not in MODES:
+        parser.error(f"mode tidak dikenal: {settings.mode!r} (pilih: {', '.join(MODES)})")
+    current = settings
+    return current
+
+current = None
+
+def get():
+    # Dipakai modul lain; kalau load() belum dipanggil, cukup dari env/file tanpa CLI.
+    if current is None:
+        return load([])
+    return current
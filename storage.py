@@ -0,0 +1,616 @@
+import asyncio
+import functools
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import timed
+
+DB_FILE = "config.db"
+
+# Satu koneksi untuk seluruh proses. sqlite3 menyimpan prepared statement
+# per koneksi (cached_statements), jadi query yang sama tidak di-parse ulang.
+_conn = None
+_lock = threading.RLock()
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA busy_timeout=5000",
+)
+
+def get_conn():
+    global _conn
+    if _conn is None:
+        with _lock:
+            if _conn is None:
+                conn = sqlite3.connect(DB_FILE, check_same_thread=False, cached_statements=256)
+                for pragma in PRAGMAS:
+                    conn.execute(pragma)
+                _conn = conn
+    return _conn
+
+# Semua akses dari handler lewat satu thread DB; antrean executor menjadi
+# antrean request, jadi event loop tetap jalan selama commit/fsync.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+async def run_db(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def close_db():
+    global _conn, _data_version
+    with _lock:
+        if _conn is not None:
+            flush_chats()
+            _conn.close()
+            _conn = None
+            _data_version = None
+
+def _fetchone(sql, params=()):
+    with _lock:
+        return get_conn().execute(sql, params).fetchone()
+
+def _fetchall(sql, params=()):
+    with _lock:
+        return get_conn().execute(sql, params).fetchall()
+
+def _execute(sql, params=()):
+    with _lock:
+        conn = get_conn()
+        conn.execute(sql, params)
+        conn.commit()
+
+def _bump_stat(conn, name, delta=1):
+    conn.execute(
+        "INSERT INTO stats (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+        (name, delta, delta),
+    )
+
+def _insert_counted(sql, params, stat):
+    # Counter hanya naik kalau baris benar-benar baru (bukan duplikat INSERT OR IGNORE).
+    with _lock:
+        conn = get_conn()
+        if conn.execute(sql, params).rowcount:
+            _bump_stat(conn, stat)
+        conn.commit()
+
+# === CACHE ===
+# Tabel config/admins/premium/groups jarang berubah, jadi disimpan di memori.
+# Write lewat helper di bawah langsung update cache (write-through). Kalau
+# proses lain menulis ke DB, PRAGMA data_version berubah dan cache dimuat ulang.
+CACHE_CHECK_INTERVAL = 5
+
+_cache = {"config": {}, "admins": set(), "premium": set(), "groups": set()}
+_data_version = None
+_checked_at = 0.0
+
+@timed("storage")
+def load_cache():
+    global _cache, _data_version, _checked_at
+    with _lock:
+        conn = get_conn()
+        _cache = {
+            "config": dict(conn.execute("SELECT key, value FROM config")),
+            "admins": {row[0] for row in conn.execute("SELECT user_id FROM admins")},
+            "premium": {row[0] for row in conn.execute("SELECT user_id FROM premium")},
+            "groups": {row[0] for row in conn.execute("SELECT chat_id FROM groups")},
+        }
+        _data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        _checked_at = time.monotonic()
+
+_refresh_pending = False
+
+def _refresh_cache():
+    # Jalan di thread DB: cek PRAGMA data_version dan muat ulang kalau ada
+    # proses lain yang menulis ke DB.
+    global _refresh_pending
+    try:
+        with _lock:
+            # Koneksi sudah ditutup (close_db): jangan dibuka lagi dari sini.
+            if _conn is None:
+                return
+            if get_conn().execute("PRAGMA data_version").fetchone()[0] != _data_version:
+                load_cache()
+    finally:
+        _refresh_pending = False
+
+def _cached(name):
+    # Dipanggil dari event loop (resolve_auth, get_config) di setiap update, jadi
+    # tidak pernah query SQLite di sini kecuali cache belum pernah dimuat.
+    # Cek versi diserahkan ke thread DB; sementara itu cache lama tetap dipakai.
+    global _checked_at, _refresh_pending
+    if _data_version is None:
+        load_cache()
+    elif time.monotonic() - _checked_at > CACHE_CHECK_INTERVAL and not _refresh_pending:
+        _checked_at = time.monotonic()
+        _refresh_pending = True
+        _executor.submit(_refresh_cache)
+    return _cache[name]
+
+# === DATABASE ===
+# Skema dikelola lewat PRAGMA user_version: setiap fungsi di MIGRATIONS
+# menaikkan versi satu langkah dan dijalankan dalam satu transaksi. Migrasi
+# ditambahkan di akhir list, jangan pernah mengubah yang sudah ada.
+STAT_TABLES = {"usage": "usage", "premium": "premium", "admins": "admins", "groups": "groups"}
+
+def _migrate_base(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS config (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    c.execute("INSERT OR IGNORE INTO config (key, value) VALUES ('group_mode', 'disabled')")
+    c.execute("INSERT OR IGNORE INTO config (key, value) VALUES ('owner_id', '')")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS admins (
+            user_id INTEGER PRIMARY KEY
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS premium (
+            user_id INTEGER PRIMARY KEY
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS usage (
+            user_id INTEGER,
+            timestamp REAL,
+            PRIMARY KEY (user_id, timestamp)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS groups (
+            chat_id INTEGER PRIMARY KEY
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS active_chats (
+            chat_id INTEGER PRIMARY KEY,
+            chat_type TEXT,
+            title TEXT
+        )
+    """)
+
+def _migrate_broadcast(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_chat_id INTEGER,
+            text TEXT,
+            status TEXT DEFAULT 'running',
+            cursor INTEGER DEFAULT 0,
+            total INTEGER,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            progress_message_id INTEGER,
+            created_at REAL
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            job_id INTEGER,
+            seq INTEGER,
+            chat_id INTEGER,
+            PRIMARY KEY (job_id, seq)
+        ) WITHOUT ROWID
+    """)
+
+def _migrate_stats(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS usage_hourly (
+            hour INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS usage_daily (
+            day INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+    """)
+    if c.execute("SELECT 1 FROM stats WHERE name = 'usage'").fetchone() is None:
+        # Isi counter dan bucket dari data yang sudah ada.
+        for name, table in STAT_TABLES.items():
+            c.execute(f"INSERT OR REPLACE INTO stats (name, value) SELECT ?, COUNT(*) FROM {table}", (name,))
+        c.execute("""
+            INSERT OR REPLACE INTO usage_hourly (hour, count)
+            SELECT CAST(timestamp / 3600 AS INTEGER), COUNT(*) FROM usage GROUP BY 1
+        """)
+        c.execute("""
+            INSERT OR REPLACE INTO usage_daily (day, count)
+            SELECT CAST(timestamp / 86400 AS INTEGER), COUNT(*) FROM usage GROUP BY 1
+        """)
+
+def _migrate_compact_usage(c):
+    # Timestamp REAL per baris -> detik integer; banding di detik yang sama
+    # digabung lewat kolom n. WITHOUT ROWID menyimpan baris langsung di B-tree PK.
+    c.execute("""
+        CREATE TABLE usage_v2 (
+            user_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            n INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (user_id, ts)
+        ) WITHOUT ROWID
+    """)
+    c.execute("""
+        INSERT INTO usage_v2 (user_id, ts, n)
+        SELECT user_id, CAST(timestamp AS INTEGER), COUNT(*) FROM usage GROUP BY 1, 2
+    """)
+    c.execute("DROP TABLE usage")
+    c.execute("ALTER TABLE usage_v2 RENAME TO usage")
+    c.execute("CREATE INDEX usage_ts ON usage (ts)")
+
+def _migrate_persistence(c):
+    # user_data/chat_data/bot_data PTB, satu baris per kunci (scope: user/chat/bot).
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS persist_data (
+            scope TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            value BLOB NOT NULL,
+            PRIMARY KEY (scope, id, key)
+        ) WITHOUT ROWID
+    """)
+
+MIGRATIONS = [
+    _migrate_base,
+    _migrate_broadcast,
+    _migrate_stats,
+    _migrate_compact_usage,
+    _migrate_persistence,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+@timed("storage")
+def init_db():
+    with _lock:
+        conn = get_conn()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            conn.execute("BEGIN")
+            try:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+@timed("storage")
+def get_config(key):
+    return _cached("config").get(key)
+
+@timed("storage")
+def set_config(key, value):
+    with _lock:
+        _execute("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, value))
+        _cache["config"][key] = value
+
+@timed("storage")
+def is_admin(user_id):
+    owner_id = get_config("owner_id")
+    if not owner_id:
+        return False
+    if str(user_id) == owner_id:
+        return True
+    return user_id in _cached("admins")
+
+@timed("storage")
+def is_premium(user_id):
+    owner_id = get_config("owner_id")
+    if str(user_id) == owner_id:
+        return True
+    return user_id in _cached("premium")
+
+@timed("storage")
+def add_premium(user_id):
+    with _lock:
+        _insert_counted("INSERT OR IGNORE INTO premium (user_id) VALUES (?)", (user_id,), "premium")
+        _cache["premium"].add(user_id)
+
+@timed("storage")
+def add_admin(user_id):
+    with _lock:
+        _insert_counted("INSERT OR IGNORE INTO admins (user_id) VALUES (?)", (user_id,), "admins")
+        _cache["admins"].add(user_id)
+
+@timed("storage")
+def list_admins():
+    return list(_cached("admins"))
+
+@timed("storage")
+def list_premium():
+    return list(_cached("premium"))
+
+@timed("storage")
+def record_usage(user_id, timestamp=None):
+    timestamp = timestamp or time.time()
+    with _lock:
+        conn = get_conn()
+        conn.execute(
+            "INSERT INTO usage (user_id, ts) VALUES (?, ?) ON CONFLICT(user_id, ts) DO UPDATE SET n = n + 1",
+            (user_id, int(timestamp)),
+        )
+        _bump_stat(conn, "usage")
+        conn.execute(
+            "INSERT INTO usage_hourly (hour, count) VALUES (?, 1) ON CONFLICT(hour) DO UPDATE SET count = count + 1",
+            (int(timestamp // 3600),),
+        )
+        conn.execute(
+            "INSERT INTO usage_daily (day, count) VALUES (?, 1) ON CONFLICT(day) DO UPDATE SET count = count + 1",
+            (int(timestamp // 86400),),
+        )
+        conn.commit()
+
+@timed("storage")
+def load_usage_since(cutoff):
+    rows = _fetchall("SELECT user_id, ts, n FROM usage WHERE ts > ? ORDER BY ts", (cutoff,))
+    return [(user_id, ts) for user_id, ts, n in rows for _ in range(n)]
+
+@timed("storage")
+def get_usage_count(user_id, window_hours=1):
+    cutoff = time.time() - (window_hours * 3600)
+    row = _fetchone("SELECT COALESCE(SUM(n), 0) FROM usage WHERE user_id = ? AND ts > ?", (user_id, cutoff))
+    return row[0]
+
+@timed("storage")
+def get_next_reset_time(user_id):
+    rows = _fetchall("""
+        SELECT ts, n FROM usage
+        WHERE user_id = ?
+        ORDER BY ts DESC
+        LIMIT 5
+    """, (user_id,))
+    timestamps = [ts for ts, n in rows for _ in range(n)][:5]
+
+    if len(timestamps) < 5:
+        return None
+
+    fifth_time = timestamps[-1]
+    next_reset = fifth_time + 3600
+    return next_reset if next_reset > time.time() else None
+
+# === RETENTION ===
+# Yang dibaca dari usage hanya 1 jam terakhir; total dan tren sudah tercatat
+# di stats/usage_hourly/usage_daily saat record_usage, jadi baris lama cukup
+# dihapus. Hapus per batch supaya lock tulis tidak ditahan lama.
+USAGE_RETENTION = 2 * 3600
+HOURLY_RETENTION = 35 * 86400
+PRUNE_BATCH = 5000
+
+@timed("storage")
+def prune_usage(now=None, batch=PRUNE_BATCH):
+    now = now or time.time()
+    with _lock:
+        conn = get_conn()
+        deleted = conn.execute("""
+            DELETE FROM usage WHERE (user_id, ts) IN (
+                SELECT user_id, ts FROM usage WHERE ts < ? LIMIT ?
+            )
+        """, (int(now - USAGE_RETENTION), batch)).rowcount
+        conn.execute("DELETE FROM usage_hourly WHERE hour < ?", (int((now - HOURLY_RETENTION) // 3600),))
+        conn.commit()
+    return deleted
+
+@timed("storage")
+def add_group(chat_id):
+    with _lock:
+        _insert_counted("INSERT OR IGNORE INTO groups (chat_id) VALUES (?)", (chat_id,), "groups")
+        _cache["groups"].add(chat_id)
+
+# === BULK IMPORT ===
+# target -> (tabel, kolom); nama tabel sama dengan nama counter di stats dan kunci _cache.
+IMPORT_TARGETS = {"admins": "user_id", "premium": "user_id", "groups": "chat_id"}
+
+@timed("storage")
+def import_ids(target, ids):
+    # Satu batch = satu transaksi. Return jumlah baris baru; sisanya duplikat.
+    column = IMPORT_TARGETS[target]
+    with _lock:
+        conn = get_conn()
+        before = conn.total_changes
+        conn.executemany(f"INSERT OR IGNORE INTO {target} ({column}) VALUES (?)", [(i,) for i in ids])
+        inserted = conn.total_changes - before
+        if inserted:
+            _bump_stat(conn, target, inserted)
+        conn.commit()
+        _cache[target].update(ids)
+        return inserted
+
+@timed("storage")
+def is_group_allowed(chat_id):
+    return chat_id in _cached("groups")
+
+# === ACTIVE CHATS (write-behind) ===
+# save_chat hanya mencatat di memori; baris yang type/title-nya tidak berubah
+# dilewati. Perubahan ditulis sekaligus oleh flush_chats() (timer, ukuran
+# buffer, atau saat close_db), jadi tidak ada commit per pesan.
+CHAT_FLUSH_SIZE = 200
+CHAT_FLUSH_INTERVAL = 30
+
+_chat_lock = threading.Lock()
+_chat_known = {}
+_chat_pending = {}
+
+@timed("storage")
+def save_chat(chat_id, chat_type, title=""):
+    row = (chat_type, title)
+    with _chat_lock:
+        if _chat_known.get(chat_id) == row:
+            return
+        _chat_known[chat_id] = row
+        _chat_pending[chat_id] = row
+        full = len(_chat_pending) >= CHAT_FLUSH_SIZE
+    if full:
+        _executor.submit(flush_chats)
+
+@timed("storage")
+def flush_chats():
+    global _chat_pending
+    with _chat_lock:
+        pending, _chat_pending = _chat_pending, {}
+    if not pending:
+        return 0
+    with _lock:
+        conn = get_conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO active_chats (chat_id, chat_type, title) VALUES (?, ?, ?)",
+            ((chat_id, chat_type, title) for chat_id, (chat_type, title) in pending.items()),
+        )
+        conn.commit()
+    return len(pending)
+
+# === EXPORT ===
+# Export membaca lewat koneksi read-only terpisah, bukan _conn: di mode WAL
+# pembaca melihat snapshot dan tidak pernah memblokir record_usage/save_chat,
+# dan thread DB tidak tertahan selama export berjalan.
+EXPORT_CHUNK = 1000
+# Baris mentah usage hanya disimpan USAGE_RETENTION (lihat prune_usage); riwayat
+# lebih lama ada di usage_hourly (HOURLY_RETENTION) dan usage_daily (permanen).
+EXPORT_QUERIES = {
+    # nama -> (kolom, query, kolom waktu untuk filter atau None, detik per unit kolom waktu)
+    "usage": (("user_id", "ts", "n"), "SELECT user_id, ts, n FROM usage", "ts", 1),
+    "hourly": (
+        ("hour_start_utc", "count"),
+        "SELECT datetime(hour * 3600, 'unixepoch'), count FROM usage_hourly", "hour", 3600,
+    ),
+    "daily": (
+        ("day_utc", "count"),
+        "SELECT date(day * 86400, 'unixepoch'), count FROM usage_daily", "day", 86400,
+    ),
+    "chats": (("chat_id", "chat_type", "title"), "SELECT chat_id, chat_type, title FROM active_chats", None, 1),
+}
+
+def iter_export(name, since=None, until=None, chunk=EXPORT_CHUNK):
+    columns, sql, time_column, unit = EXPORT_QUERIES[name]
+    conditions, params = [], []
+    # Bucket ikut kalau rentangnya beririsan dengan [since, until).
+    if time_column and since is not None:
+        conditions.append(f"{time_column} >= ?")
+        params.append(int(since) // unit)
+    if time_column and until is not None:
+        conditions.append(f"{time_column} < ?")
+        params.append(-(-int(until) // unit))
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+
+    conn = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True)
+    try:
+        conn.execute("PRAGMA busy_timeout=5000")
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+# === STATS ===
+# Semua angka dibaca dari tabel stats dan bucket per jam/hari yang diupdate
+# saat write, jadi biayanya tetap walaupun tabel usage terus bertambah.
+def _sum_buckets(conn, table, column, start, end):
+    return conn.execute(
+        f"SELECT COALESCE(SUM(count), 0) FROM {table} WHERE {column} >= ? AND {column} < ?", (start, end)
+    ).fetchone()[0]
+
+@timed("storage")
+def get_stats(now=None):
+    now = now or time.time()
+    hour = int(now // 3600) + 1
+    day = int(now // 86400) + 1
+    with _lock:
+        conn = get_conn()
+        stats = dict.fromkeys(STAT_TABLES, 0)
+        stats.update(conn.execute("SELECT name, value FROM stats"))
+        stats["usage_24h"] = _sum_buckets(conn, "usage_hourly", "hour", hour - 24, hour)
+        stats["usage_prev_24h"] = _sum_buckets(conn, "usage_hourly", "hour", hour - 48, hour - 24)
+        stats["usage_7d"] = _sum_buckets(conn, "usage_daily", "day", day - 7, day)
+        stats["usage_prev_7d"] = _sum_buckets(conn, "usage_daily", "day", day - 14, day - 7)
+    return stats
+
+# === BROADCAST ===
+BROADCAST_COLUMNS = "job_id, owner_chat_id, text, status, cursor, total, sent, failed, progress_message_id"
+
+@timed("storage")
+def create_broadcast(owner_chat_id, text, recipients):
+    with _lock:
+        conn = get_conn()
+        c = conn.execute(
+            "INSERT INTO broadcast_jobs (owner_chat_id, text, total, created_at) VALUES (?, ?, ?, ?)",
+            (owner_chat_id, text, len(recipients), time.time()),
+        )
+        job_id = c.lastrowid
+        conn.executemany(
+            "INSERT INTO broadcast_recipients (job_id, seq, chat_id) VALUES (?, ?, ?)",
+            ((job_id, seq, chat_id) for seq, chat_id in enumerate(recipients)),
+        )
+        conn.commit()
+    return job_id
+
+@timed("storage")
+def list_running_broadcasts():
+    rows = _fetchall(f"SELECT {BROADCAST_COLUMNS} FROM broadcast_jobs WHERE status = 'running'")
+    return [dict(zip(BROADCAST_COLUMNS.split(", "), row)) for row in rows]
+
+@timed("storage")
+def get_broadcast_batch(job_id, cursor, limit):
+    return [row[0] for row in _fetchall(
+        "SELECT chat_id FROM broadcast_recipients WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+        (job_id, cursor, limit),
+    )]
+
+@timed("storage")
+def set_broadcast_message(job_id, message_id):
+    _execute("UPDATE broadcast_jobs SET progress_message_id = ? WHERE job_id = ?", (message_id, job_id))
+
+@timed("storage")
+def update_broadcast(job_id, cursor, sent, failed, status="running"):
+    with _lock:
+        conn = get_conn()
+        conn.execute(
+            "UPDATE broadcast_jobs SET cursor = ?, sent = ?, failed = ?, status = ? WHERE job_id = ?",
+            (cursor, sent, failed, status, job_id),
+        )
+        if status != "running":
+            conn.execute("DELETE FROM broadcast_recipients WHERE job_id = ?", (job_id,))
+        conn.commit()
+
+# === PERSISTENCE ===
+# Dipakai persistence.SQLitePersistence; value sudah berupa bytes (pickle).
+@timed("storage")
+def load_persist_data(scope, id):
+    return dict(_fetchall("SELECT key, value FROM persist_data WHERE scope = ? AND id = ?", (scope, id)))
+
+@timed("storage")
+def save_persist_data(scope, id, changed, removed, replace=False):
+    with _lock:
+        conn = get_conn()
+        if replace:
+            conn.execute("DELETE FROM persist_data WHERE scope = ? AND id = ?", (scope, id))
+        conn.executemany(
+            "INSERT INTO persist_data (scope, id, key, value) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(scope, id, key) DO UPDATE SET value = excluded.value",
+            [(scope, id, key, value) for key, value in changed.items()],
+        )
+        conn.executemany(
+            "DELETE FROM persist_data WHERE scope = ? AND id = ? AND key = ?",
+            [(scope, id, key) for key in removed],
+        )
+        conn.commit()
+
+@timed("storage")
+def drop_persist_data(scope, id):
+    _execute("DELETE FROM persist_data WHERE scope = ? AND id = ?", (scope, id))
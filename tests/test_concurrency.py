@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Chat, Message, Update, User
+
+from concurrency import KeyedUpdateProcessor
+
+def _update(update_id, user_id):
+    user = User(user_id, "u", False)
+    chat = Chat(user_id, "private")
+    return Update(update_id, message=Message(update_id, None, chat, from_user=user, text="x"))
+
+def _run(processor, updates):
+    finished = {}
+
+    async def handler(update, seconds):
+        await asyncio.sleep(seconds)
+        finished[update.update_id] = time.monotonic()
+
+    async def main():
+        started = time.monotonic()
+        await asyncio.gather(*(
+            processor.process_update(update, handler(update, seconds)) for update, seconds in updates
+        ))
+        return {update_id: at - started for update_id, at in finished.items()}
+
+    return asyncio.run(main())
+
+def test_burst_from_one_user_does_not_hold_every_slot():
+    processor = KeyedUpdateProcessor(4)
+    burst = [(_update(i, 1), 0.2) for i in range(8)]
+    finished = _run(processor, burst + [(_update(100, 2), 0)])
+    # Update user lain langsung dapat slot, tidak menunggu antrean user 1.
+    assert finished[100] < 0.1
+    assert processor._locks == {}
+
+def test_updates_from_same_user_stay_in_order():
+    processor = KeyedUpdateProcessor(4)
+    finished = _run(processor, [(_update(i, 1), 0.05 * (3 - i)) for i in range(3)])
+    assert finished[0] < finished[1] < finished[2]
+
+def test_different_users_run_in_parallel_up_to_the_limit():
+    processor = KeyedUpdateProcessor(2)
+    finished = _run(processor, [(_update(i, i + 1), 0.2) for i in range(4)])
+    assert sorted(round(at, 1) for at in finished.values()) == [0.2, 0.2, 0.4, 0.4]